@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser
 
 from apps.accounts.managers import CustomUserManager
@@ -44,6 +45,12 @@ class User(AbstractBaseUser, IsDeletedModel):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # Purge scan of soft-deleted rows, see apps.shop.purge
+            models.Index(fields=["deleted_at", "id"], condition=Q(is_deleted=True), name="user_deleted"),
+        ]
+
     @property
     def full_name(self):
         """
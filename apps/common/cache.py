@@ -0,0 +1,186 @@
+import functools
+import hashlib
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+VERSION_KEY = "model-version:{}"
+RESPONSE_KEY = "response:{}"
+HITS_KEY = "response-cache:hits"
+MISSES_KEY = "response-cache:misses"
+
+
+class LockTimeout(APIException):
+    status_code = 503
+    default_detail = "The resource is busy, try again later."
+    default_code = "lock_timeout"
+
+
+@contextmanager
+def cache_lock(key, timeout=60, wait=10, alias=DEFAULT_CACHE_ALIAS):
+    """
+    Mutual exclusion across threads and processes sharing the cache, through the atomic cache.add.
+
+    Args:
+        key (str): The cache key of the lock.
+        timeout (int): Seconds after which a lock whose holder died is released.
+        wait (int): Seconds to wait for the lock before raising LockTimeout (503).
+        alias (str): The cache holding the lock.
+    """
+    store = caches[alias]
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    delay = 0.005
+    while not store.add(key, token, timeout=timeout):
+        if time.monotonic() >= deadline:
+            raise LockTimeout()
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+    try:
+        yield
+    finally:
+        if store.get(key) == token:
+            store.delete(key)
+
+
+def get_versions(labels):
+    """
+    Returns the current version of every model label, creating missing counters.
+
+    A missing counter (never set or evicted) starts from the current time in ns,
+    so it can never fall back to a version that already has cached responses.
+    """
+    keys = [VERSION_KEY.format(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(label):
+    key = VERSION_KEY.format(label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_model(model):
+    """Bumps the version of a model once the current transaction commits."""
+    label = model._meta.label_lower
+    transaction.on_commit(lambda: bump_version(label))
+
+
+def _invalidate_instance(sender, **kwargs):
+    invalidate_model(sender)
+
+
+def track_model_versions(*models):
+    """
+    Bumps the version of `models` on every instance save/delete. Bulk writes
+    through GetOrNoneQuerySet (update, bulk_create) bump it themselves.
+    """
+    for model in models:
+        post_save.connect(_invalidate_instance, sender=model, dispatch_uid=f"version-save-{model._meta.label_lower}")
+        post_delete.connect(_invalidate_instance, sender=model, dispatch_uid=f"version-delete-{model._meta.label_lower}")
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def cache_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = stats.get(HITS_KEY, 0), stats.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else 0.0}
+
+
+def response_cache_key(request, labels):
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+        if value != ""
+    )
+    versions = get_versions(labels)
+    raw = f"{request.get_host()}|{request.path}|{params}|{versions}"
+    return RESPONSE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def cache_response(*models, timeout=None):
+    """
+    Caches successful responses of an APIView handler.
+
+    The key is built from the path, the normalized query parameters and the
+    versions of `models`, so any write to one of them makes older entries
+    unreachable. Permission checks still run, only the handler is skipped.
+    Adds an X-Cache: HIT/MISS header.
+    """
+    labels = [model._meta.label_lower for model in models]
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = response_cache_key(request, labels)
+            cached = cache.get(key)
+            if cached is not None:
+                _incr(HITS_KEY)
+                response = Response(data=cached, status=200)
+                response["X-Cache"] = "HIT"
+                return response
+            _incr(MISSES_KEY)
+            response = handler(view, request, *args, **kwargs)
+            # Streaming responses have no data to keep
+            if response.status_code == 200 and isinstance(response, Response):
+                cache.set(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+            response["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_response(validators):
+    """
+    Answers conditional GETs (If-None-Match / If-Modified-Since) before the handler runs.
+
+    `validators` names a view method taking the handler arguments and returning
+    (etag_parts, last_modified) from a narrow query, or None when the resource does
+    not exist (the handler then produces the 404). The strong ETag is a hash of
+    etag_parts, so every value the representation depends on must be in there.
+    Apply it above cache_response so cached responses get the headers too.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            result = getattr(view, validators)(request, *args, **kwargs)
+            if result is None:
+                return handler(view, request, *args, **kwargs)
+            etag_parts, last_modified = result
+            etag = quote_etag(hashlib.md5(repr(etag_parts).encode()).hexdigest())
+            timestamp = int(last_modified.timestamp())
+            not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if not_modified is not None:
+                return not_modified
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response["ETag"] = etag
+                response["Last-Modified"] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,16 @@
+from autoslug import AutoSlugField
+
+
+class PresetAutoSlugField(AutoSlugField):
+    """
+    AutoSlugField that keeps a slug already known to be unique.
+
+    Bulk writers that allocate unique slugs themselves mark the instance with
+    `_slug_is_unique = True`, which skips the per-row uniqueness query of
+    AutoSlugField. Every other save behaves exactly like AutoSlugField.
+    """
+
+    def pre_save(self, instance, add):
+        if getattr(instance, "_slug_is_unique", False):
+            return getattr(instance, self.attname)
+        return super().pre_save(instance, add)
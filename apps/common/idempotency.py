@@ -0,0 +1,95 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.response import Response
+
+from apps.common.cache import LockTimeout, cache_lock
+
+# A stored response must outlive its key's timeout, this cache must not evict entries (see CACHES)
+IDEMPOTENCY_CACHE = "idempotency"
+idempotency_cache = ConnectionProxy(caches, IDEMPOTENCY_CACHE)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+RESULT_KEY = "idempotency:{}"
+LOCK_KEY = "idempotency-lock:{}"
+# A request killed while holding the lock frees its key after this many seconds
+LOCK_TIMEOUT = 60
+
+
+def idempotency_cache_key(request, key):
+    user = request.user.pk if request.user.is_authenticated else "anonymous"
+    raw = f"{user}|{request.method}|{request.path}|{key}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def request_fingerprint(request):
+    return hashlib.md5(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def idempotent(timeout=None, wait=None):
+    """
+    Makes an APIView handler safe to retry with an Idempotency-Key header.
+
+    The first response for a (user, method, path, key) is kept in the cache and
+    replayed, with an Idempotent-Replayed header, for every later request with
+    the same key. A duplicate that arrives while the first request is still
+    running waits for its response instead of running the handler in parallel.
+    Reusing a key with a different body is refused with a 422, and 5xx responses
+    are not kept so that the client can retry them. Requests without the header
+    are not affected.
+
+    Args:
+        timeout (int): Seconds a response is replayed, IDEMPOTENCY_KEY_TIMEOUT by default.
+        wait (int): Seconds a duplicate waits for the in-flight request, IDEMPOTENCY_WAIT_TIMEOUT by default.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            cache_key = idempotency_cache_key(request, key)
+            fingerprint = request_fingerprint(request)
+            stored = idempotency_cache.get(RESULT_KEY.format(cache_key))
+            if stored is not None:
+                return replay(stored, fingerprint)
+            locked = False
+            try:
+                # Only one request per key runs the handler, duplicates wait here for its response
+                with cache_lock(LOCK_KEY.format(cache_key), timeout=LOCK_TIMEOUT,
+                                wait=wait or settings.IDEMPOTENCY_WAIT_TIMEOUT, alias=IDEMPOTENCY_CACHE):
+                    locked = True
+                    stored = idempotency_cache.get(RESULT_KEY.format(cache_key))
+                    if stored is not None:
+                        return replay(stored, fingerprint)
+                    response = handler(view, request, *args, **kwargs)
+                    if response.status_code < 500 and isinstance(response, Response):
+                        stored = {"fingerprint": fingerprint, "status": response.status_code, "data": response.data}
+                        idempotency_cache.set(
+                            RESULT_KEY.format(cache_key), stored, timeout or settings.IDEMPOTENCY_KEY_TIMEOUT
+                        )
+                    return response
+            except LockTimeout:
+                if locked:
+                    # Raised by the handler, not by waiting for the key
+                    raise
+                return Response(
+                    data={"message": "A request with this Idempotency-Key is still in progress"}, status=409
+                )
+        return wrapper
+    return decorator
+
+
+def replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return Response(
+            data={"message": "This Idempotency-Key was already used with a different request body"}, status=422
+        )
+    response = Response(data=stored["data"], status=stored["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
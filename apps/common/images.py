@@ -0,0 +1,175 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "variants"
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}
+_pending_lock = threading.RLock()
+# Storage prefixes (upload_to) of the fields passed to track_images
+_source_prefixes = set()
+
+
+def variant_name(name, variant):
+    """
+    Returns the storage name of a variant, e.g. variants/product_images/phone.jpg.thumb.webp.
+    It only depends on the original name, so URLs are built without any I/O. The
+    extension stays in the name: phone.jpg and phone.png have different variants.
+    """
+    return f"{VARIANTS_DIR}/{name}.{variant}.webp"
+
+
+def is_source_image(name):
+    """
+    Whether variants can be rendered from a storage name: an upload of a tracked
+    image field, never a rendered variant.
+    """
+    if name.startswith(f"{VARIANTS_DIR}/"):
+        return False
+    return any(name.startswith(prefix) for prefix in _source_prefixes)
+
+
+@cache
+def variants_base_url():
+    placeholder = reverse("image-variant", kwargs={"variant": "v", "name": "n"})
+    return placeholder[:-len("v/n")]
+
+
+@lru_cache(maxsize=4096)
+def variant_urls(name):
+    """
+    Returns {variant: url} for an original image name, None when there is no image.
+    URLs go through ImageVariantView, which renders a missing variant on first request.
+    The result is cached and shared, do not modify it.
+    """
+    if not name:
+        return None
+    path = filepath_to_uri(name)
+    base = variants_base_url()
+    return {variant: f"{base}{variant}/{path}" for variant in settings.IMAGE_VARIANTS}
+
+
+def render_variant(storage, name, variant):
+    """
+    Renders one variant of an image and saves it next to the other variants.
+
+    Sized variants are cropped to exactly that size, the others keep the original size.
+
+    Returns:
+        str: The storage name of the variant.
+    """
+    target = variant_name(name, variant)
+    size = settings.IMAGE_VARIANTS[variant]
+    with storage.open(name, "rb") as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        if size:
+            image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+    if storage.exists(target):
+        storage.delete(target)
+    storage.save(target, ContentFile(buffer.getvalue()))
+    return target
+
+
+def ensure_variants(storage, name, variants=None, force=False):
+    """
+    Renders the variants of an image that are not on disk yet.
+
+    Args:
+        storage (Storage): The storage of the original image.
+        name (str): The storage name of the original image.
+        variants (iterable): The variants to check, all of them by default.
+        force (bool): Render even the variants that already exist.
+
+    Returns:
+        list: The storage names of the rendered variants, empty when the original is missing.
+    """
+    rendered = []
+    if not storage.exists(name):
+        return rendered
+    for variant in variants or settings.IMAGE_VARIANTS:
+        if force or not storage.exists(variant_name(name, variant)):
+            rendered.append(render_variant(storage, name, variant))
+    return rendered
+
+
+def executor():
+    """The process-wide worker pool; Pillow releases the GIL while decoding, resizing and encoding."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+        return _executor
+
+
+def submit_variants(storage, name, variants=None, force=False):
+    """
+    Renders the variants of an image in the worker pool.
+
+    A second request for an image that is already queued joins the pending job.
+
+    Returns:
+        Future: Resolves to the list returned by ensure_variants.
+    """
+    key = (name, tuple(variants) if variants else None, force)
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None:
+            future = executor().submit(_run, storage, name, variants, force)
+            _pending[key] = future
+            future.add_done_callback(lambda _: _forget(key))
+        return future
+
+
+def _run(storage, name, variants, force):
+    try:
+        return ensure_variants(storage, name, variants, force)
+    except Exception:
+        logger.exception("Cannot render the variants of %s", name)
+        raise
+
+
+def _forget(key):
+    with _pending_lock:
+        _pending.pop(key, None)
+
+
+def track_images(model, *field_names):
+    """
+    Renders the variants of the given image fields in the background whenever an
+    instance is saved with a new image, once the transaction commits.
+    """
+    fields = [model._meta.get_field(field_name) for field_name in field_names]
+    for field in fields:
+        if isinstance(field.upload_to, str):
+            # The static part of the prefix, upload_to may contain strftime placeholders
+            prefix = field.upload_to.split("%", 1)[0]
+            if prefix:
+                _source_prefixes.add(prefix if prefix.endswith("/") else f"{prefix}/")
+
+    def schedule(sender, instance, created, update_fields=None, **kwargs):
+        for field in fields:
+            if update_fields is not None and field.name not in update_fields:
+                continue
+            name = getattr(instance, field.attname).name
+            if name:
+                transaction.on_commit(lambda field=field, name=name: submit_variants(field.storage, name))
+
+    post_save.connect(schedule, sender=model, weak=False, dispatch_uid=f"track_images_{model._meta.label}")
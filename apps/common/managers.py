@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
 
+from apps.common.cache import invalidate_model
+
 class GetOrNoneQuerySet(models.QuerySet):
     """Custom QuerySet that supports get_or_none()"""
 
@@ -10,6 +12,17 @@ class GetOrNoneQuerySet(models.QuerySet):
         except self.model.DoesNotExist:
             return None
 
+    def update(self, **kwargs):
+        # Bulk writes skip post_save, keep cached responses consistent here
+        rows = super().update(**kwargs)
+        invalidate_model(self.model)
+        return rows
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        invalidate_model(self.model)
+        return objs
+
 
 class GetOrNoneManager(models.Manager):
     """Adds get_or_none method to objects"""
@@ -29,11 +42,13 @@ class IsDeletedQuerySet(GetOrNoneQuerySet):
 
 
 class IsDeletedManager(GetOrNoneManager):
+    queryset_class = IsDeletedQuerySet
+
     def get_queryset(self):
-        return IsDeletedQuerySet(self.model).filter(is_deleted=False)
+        return self.queryset_class(self.model).filter(is_deleted=False)
 
     def unfiltered(self):
-        return IsDeletedQuerySet(self.model)
+        return self.queryset_class(self.model)
 
     def hard_delete(self):
         return self.unfiltered().delete(hard_delete=True)
\ No newline at end of file
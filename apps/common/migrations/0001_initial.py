@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:23
+
+import apps.common.utils
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRow',
+            fields=[
+                ('id', models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id'), name='archived_row_unique')],
+            },
+        ),
+    ]
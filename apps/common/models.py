@@ -1,7 +1,8 @@
-import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.db import models
 from apps.common.managers import IsDeletedManager, GetOrNoneManager
+from apps.common.utils import default_id
 
 
 class BaseModel(models.Model):
@@ -9,12 +10,13 @@ class BaseModel(models.Model):
     A base model class that includes common fields and methods for all models.
 
     Attributes:
-        id (UUIDField): Unique identifier for the model instance.
+        id (UUIDField): Unique identifier for the model instance, time-ordered (UUIDv7)
+            when UUID7_PRIMARY_KEYS is on.
         created_at (DateTimeField): Timestamp when the instance was created.
         updated_at (DateTimeField): Timestamp when the instance was last updated.
     """
 
-    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False, unique=True)
+    id = models.UUIDField(default=default_id, primary_key=True, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -28,6 +30,8 @@ class IsDeletedModel(BaseModel):
     deleted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
+        # Newest first only in tables whose ids are all UUIDv7 (created with UUID7_PRIMARY_KEYS on):
+        # older UUIDv4 ids are random and most of them sort above every v7 id. Served by the primary key index
         ordering = ['-id']
         abstract = True
 
@@ -37,7 +41,29 @@ class IsDeletedModel(BaseModel):
         # Мягкое удаление is_deleted=True
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save(update_fields=["is_deleted", "deleted_at"])
+        self.save(update_fields=["is_deleted", "deleted_at", "updated_at"])
 
     def hard_delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        super().delete(*args, **kwargs)
+
+class ArchivedRow(BaseModel):
+    """
+    A soft-deleted row moved out of its table by the purge_deleted command.
+
+    Attributes:
+        model (str): The label of the model the row belonged to, e.g. shop.Product.
+        object_id (UUID): The primary key the row had.
+        deleted_at (datetime): When the row was soft deleted.
+        data (dict): The column values of the row.
+    """
+
+    model = models.CharField(max_length=100)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        constraints = [
+            # A batch replayed after a crash does not archive its rows twice
+            models.UniqueConstraint(fields=["model", "object_id"], name="archived_row_unique"),
+        ]
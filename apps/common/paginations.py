@@ -1,6 +1,139 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination, CursorPagination, _reverse_ordering
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # Параметр запроса для изменения размера страницы
-    max_page_size = 100  # Максимально допустимый размер страницы
\ No newline at end of file
+    max_page_size = 100  # Максимально допустимый размер страницы
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset pagination: every page is a single index range scan, without COUNT(*) and OFFSET.
+
+    The ordering can be switched with the `ordering` query parameter, each option is a
+    (field, id) tuple. Unlike DRF's cursor, which keeps only the first field and skips
+    ties with an OFFSET, the cursor position holds both values and pages continue with
+    `field > value OR (field = value AND id > id)`, so equal prices or timestamps never
+    repeat or drop rows. Any other `ordering` value is rejected with a 400.
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    ordering_options = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'price': ('price_current', 'id'),
+        '-price': ('-price_current', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering')
+        if ordering is None:
+            return self.ordering
+        if ordering not in self.ordering_options:
+            raise ValidationError(
+                {'ordering': [f"Cursor pagination supports {', '.join(self.ordering_options)}"]}
+            )
+        return self.ordering_options[ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's implementation with the position filter replaced by the tuple comparison.
+        # Positions are unique (the ordering ends with id), so cursors never carry an offset
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = self.filter_position(queryset, current_position, reverse)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def filter_position(self, queryset, position, reverse):
+        """Keeps the rows strictly after (before when reverse) a position in the current ordering."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        conditions = []
+        for index, order in enumerate(self.ordering):
+            name = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            equal = {field.lstrip('-'): value for field, value in zip(self.ordering[:index], values)}
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": values[index]}))
+        try:
+            return queryset.filter(reduce(or_, conditions))
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip('-')
+            values.append(str(instance[name] if isinstance(instance, dict) else getattr(instance, name)))
+        return json.dumps(values, separators=(',', ':'))
+
+
+class CreatedCursorPagination(CustomCursorPagination):
+    """
+    Keyset pagination over (created_at, id) for models without a price, newest first.
+    Rows created in the same instant are told apart by id, the cursor holds both.
+    """
+
+    ordering_options = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+    }
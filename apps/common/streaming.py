@@ -0,0 +1,49 @@
+import zlib
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+GZIP_CONTENT_TYPE = "application/gzip"
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_ndjson(request):
+    return request.query_params.get("stream") == "ndjson"
+
+
+def iter_ndjson(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE, **serializer_kwargs):
+    """
+    Yields one JSON document per row, serializing the queryset chunk by chunk.
+
+    The queryset is read with .iterator() (server-side cursor where the backend
+    supports it), so memory stays bounded by one chunk whatever the result size.
+    Extra keyword arguments are passed to the serializer.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield "".join(encoder.encode(row) + "\n" for row in serializer_class(chunk, many=True, **serializer_kwargs).data)
+            chunk = []
+    if chunk:
+        yield "".join(encoder.encode(row) + "\n" for row in serializer_class(chunk, many=True, **serializer_kwargs).data)
+
+
+def ndjson_response(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE, **serializer_kwargs):
+    return StreamingHttpResponse(
+        iter_ndjson(queryset, serializer_class, chunk_size, **serializer_kwargs), content_type=NDJSON_CONTENT_TYPE
+    )
+
+
+def iter_gzip(chunks, compresslevel=6):
+    """
+    Gzips a stream of text chunks on the fly, without ever holding the whole output.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
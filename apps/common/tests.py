@@ -1,3 +1,186 @@
-from django.test import TestCase
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from apps.common.idempotency import LOCK_KEY, idempotency_cache, idempotency_cache_key, idempotent
+from apps.common.images import submit_variants, variant_name
+from apps.common import utils
+from apps.common.utils import CODE_ALPHABET, CodeGenerator, generate_unique_code, uuid7
+from apps.shop.models import Category
+
+
+def generate_codes(count):
+    # The production path: the generator of this process, with its default node
+    return "".join(generate_unique_code() for _ in range(count)).encode()
+
+
+class CodeGeneratorStressTest(SimpleTestCase):
+    processes = 4
+
+    def generate(self, codes_per_process):
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(self.processes, mp_context=context) as pool:
+            chunks = pool.map(generate_codes, [codes_per_process] * self.processes)
+            codes = np.frombuffer(b"".join(chunks), dtype="S12")
+
+        self.assertEqual(len(codes), self.processes * codes_per_process)
+        self.assertEqual(len(np.unique(codes)), len(codes))
+        pattern = re.compile(f"[{CODE_ALPHABET}]{{12}}")
+        for code in codes[::10_000]:
+            self.assertRegex(code.decode(), pattern)
+
+    def test_codes_are_unique_across_processes(self):
+        self.generate(50_000)
+
+    @skipUnless(os.environ.get("STRESS_TESTS"), "set STRESS_TESTS=1 to generate millions of codes")
+    def test_millions_of_codes(self):
+        self.generate(500_000)
+
+    def test_node_from_environment(self):
+        with mock.patch.dict(os.environ, {"TX_REF_NODE": "7"}):
+            utils._reset_generator()
+            code = generate_unique_code()
+        utils._reset_generator()
+        self.assertEqual(code[8:11], CodeGenerator.encode(7, 3))
+
+
+class UUID7Test(SimpleTestCase):
+    def test_layout_and_order(self):
+        before = time.time_ns() // 1_000_000
+        ids = [uuid7() for _ in range(10_000)]
+        after = time.time_ns() // 1_000_000
+
+        self.assertEqual({(value.version, value.variant) for value in ids}, {(7, uuid.RFC_4122)})
+        self.assertTrue(before <= ids[0].int >> 80 <= ids[-1].int >> 80 <= after + 1)
+        # Hex strings (the SQLite column) and UUIDs (PostgreSQL) both sort in creation order
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(sorted(value.hex for value in ids), [value.hex for value in ids])
+        self.assertEqual(len(set(ids)), len(ids))
+
+
+class ImageVariantTest(TestCase):
+    def setUp(self):
+        media = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def save_image(self, name):
+        buffer = BytesIO()
+        Image.new("RGB", (400, 300), "red").save(buffer, "PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_variant_round_trip(self):
+        name = self.save_image("product_images/phone.png")
+        response = self.client.get(f"/common/images/thumb/{name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        with Image.open(BytesIO(b"".join(response.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (200, 200)))
+
+        # Variants of variants and files outside the upload folders are not rendered
+        self.assertEqual(self.client.get(f"/common/images/thumb/{variant_name(name, 'thumb')}").status_code, 404)
+        self.save_image("private/phone.png")
+        self.assertEqual(self.client.get("/common/images/thumb/private/phone.png").status_code, 404)
+        self.assertEqual(default_storage.listdir("variants/product_images")[1], ["phone.png.thumb.webp"])
+
+    def test_originals_with_the_same_stem_have_their_own_variants(self):
+        names = [self.save_image("product_images/phone.png"), "product_images/phone.jpg"]
+        buffer = BytesIO()
+        Image.new("RGB", (400, 300), "blue").save(buffer, "JPEG")
+        default_storage.save(names[1], ContentFile(buffer.getvalue()))
+        colors = []
+        for name in names:
+            response = self.client.get(f"/common/images/full/{name}")
+            self.assertEqual(response.status_code, 200)
+            with Image.open(BytesIO(b"".join(response.streaming_content))) as image:
+                colors.append(image.convert("RGB").getpixel((0, 0)))
+        self.assertGreater(colors[0][0], 200)  # red
+        self.assertGreater(colors[1][2], 200)  # blue
+
+    def test_saved_image_is_rendered_in_background(self):
+        name = self.save_image("category_images/phones.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Phones", image=name)
+        # Joins the job queued on commit, or finds every variant rendered
+        submit_variants(default_storage, name).result(timeout=30)
+        for variant in settings.IMAGE_VARIANTS:
+            self.assertTrue(default_storage.exists(variant_name(name, variant)), variant)
+
+
+class SlowCreateView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    calls = 0
+
+    @idempotent()
+    def post(self, request):
+        type(self).calls += 1
+        time.sleep(0.2)
+        return Response(data={"call": type(self).calls, **request.data}, status=201)
+
+
+class IdempotencyTest(SimpleTestCase):
+    def setUp(self):
+        idempotency_cache.clear()
+        SlowCreateView.calls = 0
+        self.view = SlowCreateView.as_view()
+
+    def post(self, data, key="key-1"):
+        request = APIRequestFactory().post("/things/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        return self.view(request)
+
+    def test_replay(self):
+        first = self.post({"name": "a"})
+        self.assertEqual((first.status_code, first.data["call"]), (201, 1))
+        # Response cache traffic cannot evict the stored response
+        cache.set_many({f"filler:{i}": i for i in range(400)})
+        again = self.post({"name": "a"})
+        self.assertEqual((again.status_code, again.data), (201, first.data))
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(self.post({"name": "a"}, key="key-2").data["call"], 2)
+
+    def test_reused_key_with_another_body(self):
+        self.post({"name": "a"})
+        self.assertEqual(self.post({"name": "b"}).status_code, 422)
+        self.assertEqual(SlowCreateView.calls, 1)
+
+    def test_concurrent_duplicates_run_once(self):
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.post({"name": "a"}))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowCreateView.calls, 1)
+        self.assertEqual([response.data["call"] for response in responses], [1] * 4)
+        self.assertEqual(sum(response.has_header("Idempotent-Replayed") for response in responses), 3)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.1)
+    def test_conflict_while_in_progress(self):
+        # A first request that holds the key and has not finished
+        request = APIRequestFactory().post("/things/")
+        request.user = AnonymousUser()
+        key = idempotency_cache_key(request, "key-1")
+        idempotency_cache.add(LOCK_KEY.format(key), "other", timeout=60)
+        response = self.post({"name": "a"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SlowCreateView.calls, 0)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from apps.common.views import CacheStatsView, ImageVariantView
+
+urlpatterns = [
+    path("cache/stats/", CacheStatsView.as_view()),
+    path("images/<str:variant>/<path:name>", ImageVariantView.as_view(), name="image-variant"),
+]
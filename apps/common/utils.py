@@ -1,29 +1,148 @@
+import os
 import secrets
+import socket
+import threading
+import time
+import uuid
+import zlib
 
-from apps.common.models import BaseModel
+from django.conf import settings
 
+CODE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ123456789"
+CODE_EPOCH_MS = 1735689600000  # 2025-01-01 00:00:00 UTC
 
-def generate_unique_code(model: BaseModel, field: str) -> str:
+
+class CodeGenerator:
     """
-    Generate a unique code for a specified model and field.
+    Generates 12-character codes over CODE_ALPHABET without a database lookup:
+
+        8 chars  milliseconds since CODE_EPOCH_MS (lasts until 2096)
+        3 chars  node: the generating process
+        1 char   sequence within the millisecond
+
+    Codes of one generator never repeat: the clock is kept monotonic and when the
+    sequence of a millisecond runs out the generator moves on to the next one.
+    Codes of generators with different nodes never collide, so codes are unique by
+    construction as long as every live process has its own node. The default node,
+    crc32(host name) + pid, differs between processes of one host whose pids are
+    less than NODES apart, but processes on different hosts can share it. Two
+    processes that share a node only collide when they draw the same sequence in
+    the same millisecond (the sequence starts at a random offset every millisecond),
+    which the unique constraint on tx_ref catches.
 
     Args:
-        model (BaseModel): The model class to check for uniqueness.
-        field (str): The field name to check for uniqueness.
+        node (int): 0 to NODES - 1, derived from the host name and pid by default.
+    """
+
+    BASE = len(CODE_ALPHABET)
+    TIME_CHARS, NODE_CHARS = 8, 3
+    NODES = BASE ** NODE_CHARS
+    SEQUENCES = BASE
+
+    def __init__(self, node=None):
+        if node is None:
+            node = zlib.crc32(socket.gethostname().encode()) + os.getpid()
+        self.node = self.encode(node % self.NODES, self.NODE_CHARS)
+        self.lock = threading.Lock()
+        self.last_ms = -1
+        self.prefix = ""
+        self.start = 0
+        self.issued = 0
+
+    @classmethod
+    def encode(cls, value, chars):
+        digits = []
+        for _ in range(chars):
+            value, digit = divmod(value, cls.BASE)
+            digits.append(CODE_ALPHABET[digit])
+        return "".join(reversed(digits))
+
+    def next_ms(self, ms):
+        self.last_ms, self.start, self.issued = ms, secrets.randbelow(self.SEQUENCES), 0
+        self.prefix = self.encode(ms, self.TIME_CHARS) + self.node
+
+    def __call__(self):
+        with self.lock:
+            now = time.time_ns() // 1_000_000 - CODE_EPOCH_MS
+            if now > self.last_ms:
+                self.next_ms(now)
+            elif self.issued == self.SEQUENCES:
+                # Sequence exhausted: borrow the next millisecond, the clock catches up
+                self.next_ms(self.last_ms + 1)
+            sequence = (self.start + self.issued) % self.SEQUENCES
+            self.issued += 1
+            return self.prefix + CODE_ALPHABET[sequence]
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = [-1, 0]  # [milliseconds, counter] of the last UUIDv7
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits are the Unix time in milliseconds, followed by a 12-bit
+    counter (rand_a) that starts at a random value every millisecond and keeps
+    the UUIDs of one process increasing within it, then 62 random bits. Ordering
+    by such ids is ordering by creation time, and new rows land at the right edge
+    of the primary key index instead of a random page.
+    """
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        last_ms, counter = _uuid7_last
+        if ms > last_ms:
+            counter = secrets.randbelow(1 << 11)  # leave room to count up
+        else:
+            ms, counter = last_ms, counter + 1
+            if counter >= 1 << 12:
+                # Counter exhausted: borrow the next millisecond, the clock catches up
+                ms, counter = ms + 1, secrets.randbelow(1 << 11)
+        _uuid7_last[:] = ms, counter
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def default_id() -> uuid.UUID:
+    """Primary key default of BaseModel: UUIDv7 when UUID7_PRIMARY_KEYS is on, UUIDv4 otherwise."""
+    return uuid7() if settings.UUID7_PRIMARY_KEYS else uuid.uuid4()
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def _reset_generator():
+    # A forked child has another pid and may have its own TX_REF_NODE, so another node
+    global _generator
+    _generator = None
+
+
+os.register_at_fork(after_in_child=_reset_generator)
+
+
+def generate_unique_code() -> str:
+    """
+    Generate a unique 12-character code, e.g. an order tx_ref, without querying the database.
+
+    The node is read from the TX_REF_NODE environment variable of the process when
+    the first code is generated, so it must be set per process after the fork, e.g. in
+    a gunicorn post_fork hook. A value set in the settings or inherited from a
+    pre-fork master would give every worker the same node.
 
     Returns:
-        str: A unique code.
+        str: A code from this process' CodeGenerator.
     """
-    allowed_chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZ123456789"
-    unique_code = "".join(secrets.choice(allowed_chars) for _ in range(12))
-    code = unique_code
-    similar_object_exists = model.objects.filter(**{field: code}).exists()
-    if not similar_object_exists:
-        return code
-    return generate_unique_code(model, field)
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                node = os.environ.get("TX_REF_NODE")
+                _generator = CodeGenerator(None if node is None else int(node))
+    return _generator()
 
 
 def set_dict_attr(obj, data):
     for attr, value in data.items():
         setattr(obj, attr, value) # Или obj.attr = value для каждого атрибута
-    return obj
\ No newline at end of file
+    return obj
@@ -1,3 +1,74 @@
-from django.shortcuts import render
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-# Create your views here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from django.utils.cache import patch_cache_control
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.common.cache import cache_stats
+from apps.common.images import is_source_image, submit_variants, variant_name
+
+tags = ["Common"]
+
+
+class CacheStatsSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_ratio = serializers.FloatField()
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = CacheStatsSerializer
+
+    @extend_schema(
+        summary="Response Cache Stats",
+        description="""
+            This endpoint returns the hit/miss counters of the catalog response cache.
+        """,
+        tags=tags,
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.serializer_class(cache_stats())
+        return Response(data=serializer.data, status=200)
+
+
+class ImageVariantView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    # Seconds to wait for the worker pool before giving up on a first request
+    render_timeout = 30
+
+    @extend_schema(
+        summary="Image Variant",
+        description="""
+            This endpoint returns a thumbnail or WebP variant of an uploaded product,
+            category or avatar image. A variant that does not exist yet is rendered on first request and kept on disk.
+        """,
+        tags=tags,
+        responses={(200, "image/webp"): OpenApiTypes.BINARY},
+    )
+    def get(self, request, variant, name):
+        parts = name.split("/")
+        # Only uploads of image fields: rendering a variant of a variant would let anyone fill the disk
+        if variant not in settings.IMAGE_VARIANTS or ".." in parts or not is_source_image(name):
+            return Response(data={"message": "Image does not exist!"}, status=404)
+        target = variant_name(name, variant)
+        if not default_storage.exists(target):
+            if not default_storage.exists(name):
+                return Response(data={"message": "Image does not exist!"}, status=404)
+            try:
+                submit_variants(default_storage, name, [variant]).result(timeout=self.render_timeout)
+            except FutureTimeoutError:
+                return Response(data={"message": "Image is being processed"}, status=503, headers={"Retry-After": "5"})
+            except Exception:
+                return Response(data={"message": "Image cannot be processed"}, status=422)
+        response = FileResponse(default_storage.open(target, "rb"), content_type="image/webp")
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24)
+        return response
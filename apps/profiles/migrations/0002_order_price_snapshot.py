@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_prices(apps, schema_editor):
+    # The price at checkout was never stored, the current price is the best estimate
+    OrderItem = apps.get_model('profiles', 'OrderItem')
+    Product = apps.get_model('shop', 'Product')
+    OrderItem.objects.filter(order__isnull=False, unit_price__isnull=True).update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product')).values('price_current')[:1]),
+    )
+    Order = apps.get_model('profiles', 'Order')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    subtotal = Coalesce(
+        Subquery(items.annotate(s=Sum(F('unit_price') * F('quantity'))).values('s')),
+        Value(0),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    Order.objects.update(subtotal=subtotal, total=subtotal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
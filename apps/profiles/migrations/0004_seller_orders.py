@@ -0,0 +1,84 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:03
+
+import django.db.models.deletion
+import uuid
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+
+
+def split_orders(apps, schema_editor):
+    Order = apps.get_model('profiles', 'Order')
+    OrderItem = apps.get_model('profiles', 'OrderItem')
+    SellerOrder = apps.get_model('profiles', 'SellerOrder')
+    rows = (
+        OrderItem.objects.filter(order__isnull=False, seller_order__isnull=True, product__seller__isnull=False)
+        .order_by()
+        .values('order', 'product__seller')
+        .annotate(subtotal=Sum(F('unit_price') * F('quantity')))
+    )
+    parts = [
+        SellerOrder(order_id=row['order'], seller_id=row['product__seller'], subtotal=row['subtotal'] or 0,
+                    total=row['subtotal'] or 0)
+        for row in rows
+    ]
+    SellerOrder.objects.bulk_create(parts, batch_size=500)
+    # Keep the order date and delivery progress of the parent order
+    orders = Order.objects.filter(pk=OuterRef('order'))
+    SellerOrder.objects.update(
+        created_at=Subquery(orders.values('created_at')[:1]),
+        delivery_status=Subquery(orders.values('delivery_status')[:1]),
+        date_delivered=Subquery(orders.values('date_delivered')[:1]),
+    )
+    part_ids = defaultdict(dict)
+    for part in SellerOrder.objects.values('id', 'order', 'seller'):
+        part_ids[part['order']][part['seller']] = part['id']
+    items = list(
+        OrderItem.objects.filter(order__isnull=False, seller_order__isnull=True, product__seller__isnull=False)
+        .only('id', 'order', 'product__seller')
+        .select_related('product')
+    )
+    for item in items:
+        item.seller_order_id = part_ids[item.order_id][item.product.seller_id]
+    OrderItem.objects.bulk_update(items, ['seller_order'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_order_user_created_index'),
+        ('sellers', '0001_initial'),
+        ('shop', '0011_product_live_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerOrder',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('delivery_status', models.CharField(choices=[('PENDING', 'PENDING'), ('PACKING', 'PACKING'), ('SHIPPING', 'SHIPPING'), ('ARRIVING', 'ARRIVING'), ('SUCCESS', 'SUCCESS')], default='PENDING', max_length=20)),
+                ('date_delivered', models.DateTimeField(blank=True, null=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_orders', to='profiles.order')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='sellers.seller')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orderitems', to='profiles.sellerorder'),
+        ),
+        migrations.AddIndex(
+            model_name='sellerorder',
+            index=models.Index(fields=['seller', 'created_at', 'id'], name='seller_order_seller_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='sellerorder',
+            constraint=models.UniqueConstraint(fields=('order', 'seller'), name='seller_order_unique'),
+        ),
+        migrations.RunPython(split_orders, migrations.RunPython.noop),
+    ]
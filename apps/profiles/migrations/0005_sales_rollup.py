@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:06
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_seller_orders'),
+        ('sellers', '0001_initial'),
+        ('shop', '0011_product_live_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='shop.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='sellers.seller')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('seller', 'product', 'day'), name='sales_rollup_product_day'), models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('seller', 'day'), name='sales_rollup_seller_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:12
+
+import apps.common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_sales_rollup'),
+    ]
+
+    # Only the Python default changes: skip the SQLite table rebuild
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='orderitem',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='salesrollup',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='sellerorder',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='shippingaddress',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -1,7 +1,13 @@
+from contextlib import nullcontext
+
 from apps.common.utils import generate_unique_code
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from apps.common.models import BaseModel
 from apps.shop.models import Product
+from apps.sellers.models import Seller
 from apps.accounts.models import User
 
 DELIVERY_STATUS_CHOICES = (
@@ -20,6 +26,12 @@ PAYMENT_STATUS_CHOICES = (
     ("FAILED", "FAILED"),
 )
 
+# Attempts at a free tx_ref before Order.save gives up
+TX_REF_ATTEMPTS = 3
+
+# Orders in these states are not counted as sales
+UNCOUNTED_PAYMENT_STATUSES = ("CANCELLED", "FAILED")
+
 
 class ShippingAddress(BaseModel):
     """
@@ -64,12 +76,16 @@ class Order(BaseModel):
         tx_ref (str): The unique transaction reference.
         delivery_status (str): The delivery status of the order.
         payment_status (str): The payment status of the order.
+        subtotal (Decimal): The sum of the item totals, fixed at checkout.
+        total (Decimal): The amount to pay, fixed at checkout.
 
     Methods:
         __str__():
             Returns a string representation of the transaction reference.
         save(*args, **kwargs):
             Overrides the save method to generate a unique transaction reference when a new order is created.
+        cancel():
+            Cancels the order and releases its reserved stock.
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
@@ -83,6 +99,10 @@ class Order(BaseModel):
 
     date_delivered = models.DateTimeField(null=True, blank=True)
 
+    # Snapshotted at checkout so that repricing a product does not change placed orders
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
     # Shipping address details
     full_name = models.CharField(max_length=1000, null=True)
     email = models.EmailField(null=True)
@@ -92,14 +112,119 @@ class Order(BaseModel):
     country = models.CharField(max_length=100, null=True)
     zipcode = models.CharField(max_length=6, null=True)
 
+    class Meta:
+        indexes = [
+            # Order history: one range scan per cursor page
+            models.Index(fields=["user", "created_at", "id"], name="order_user_created"),
+        ]
+
     def __str__(self):
         return f"{self.user.full_name}'s order"
 
     def save(self, *args, **kwargs) -> None:
-        if not self.pk:
-            self.tx_ref = generate_unique_code(Order, "tx_ref")
-        super().save(*args, **kwargs)
+        # pk is set by the uuid default before the first save, check the state instead
+        if not (self._state.adding and not self.tx_ref):
+            return super().save(*args, **kwargs)
+        # Generated codes are unique by construction, the unique constraint is the safety net.
+        # A failed INSERT aborts the surrounding transaction on PostgreSQL, so inside one it runs
+        # in a savepoint; in autocommit mode there is nothing to protect and it is a single INSERT
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        in_transaction = transaction.get_connection(using).in_atomic_block
+        for attempt in range(TX_REF_ATTEMPTS):
+            self.tx_ref = generate_unique_code()
+            try:
+                with transaction.atomic(using=using) if in_transaction else nullcontext():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Order.objects.filter(tx_ref=self.tx_ref).exists()
+                if not taken or attempt == TX_REF_ATTEMPTS - 1:
+                    self.tx_ref = ""
+                    raise
+
+    def item_quantities(self):
+        """Returns {product id: ordered quantity} of the order."""
+        rows = self.orderitems.order_by().values("product").annotate(quantity=Sum("quantity"))
+        return {row["product"]: row["quantity"] for row in rows}
+
+    def cancel(self):
+        """
+        Cancels the order and puts its items back in stock.
+
+        The status change is a conditional UPDATE, so when two requests cancel the
+        same order the stock is released only once.
+
+        Returns:
+            bool: False when the order could not be cancelled (already cancelled, paid or shipped).
+        """
+        with transaction.atomic():
+            cancellable = (
+                Order.objects.filter(pk=self.pk, delivery_status="PENDING")
+                .exclude(payment_status__in=("SUCCESSFUL", "CANCELLED"))
+                .exists()
+            )
+            if not cancellable or not self.set_payment_status("CANCELLED"):
+                return False
+            Product.release_stock(self.item_quantities())
+        return True
+
+    def set_payment_status(self, status):
+        """
+        Changes the payment status and keeps the seller sales rollups in step:
+        an order stops counting as a sale when it is cancelled or fails, and
+        counts again if a failed payment is retried.
+
+        Returns:
+            bool: False when the status was already `status` or changed concurrently.
+        """
+        with transaction.atomic():
+            previous = Order.objects.filter(pk=self.pk).values_list("payment_status", flat=True).first()
+            if previous is None or previous == status:
+                return False
+            changed = Order.objects.filter(pk=self.pk, payment_status=previous).update(
+                payment_status=status, updated_at=timezone.now()
+            )
+            if not changed:
+                return False
+            counted, counts = previous not in UNCOUNTED_PAYMENT_STATUSES, status not in UNCOUNTED_PAYMENT_STATUSES
+            if counted != counts:
+                SalesRollup.record(self, 1 if counts else -1)
+        self.payment_status = status
+        return True
+
+
+class SellerOrder(BaseModel):
+    """
+    The part of an order one seller fulfils, created at checkout.
+
+    Attributes:
+        order (ForeignKey): The order this part belongs to.
+        seller (ForeignKey): The seller of every item of this part.
+        delivery_status (str): The delivery status of this part.
+        date_delivered (datetime): When this part was delivered.
+        subtotal (Decimal): The sum of the item totals of this part.
+        total (Decimal): The amount of this part.
+    """
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="seller_orders")
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name="orders")
+    delivery_status = models.CharField(
+        max_length=20, default="PENDING", choices=DELIVERY_STATUS_CHOICES
+    )
+    date_delivered = models.DateTimeField(null=True, blank=True)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order", "seller"], name="seller_order_unique"),
+        ]
+        indexes = [
+            # Seller order list: one range scan per cursor page
+            models.Index(fields=["seller", "created_at", "id"], name="seller_order_seller_created"),
+        ]
 
+    def __str__(self):
+        return f"{self.order.tx_ref} ({self.seller.business_name})"
 
 
 class OrderItem(BaseModel):
@@ -110,8 +235,8 @@ class OrderItem(BaseModel):
         order (ForeignKey): The order to which this item belongs.
         product (ForeignKey): The product associated with this order item.
         quantity (int): The quantity of the product ordered.
-
-
+        unit_price (Decimal): The product price at checkout, None while the item is in the cart.
+        seller_order (ForeignKey): The part of the order of the product seller, set at checkout.
     """
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -122,12 +247,21 @@ class OrderItem(BaseModel):
         on_delete=models.CASCADE,
         blank=True,
     )
+    seller_order = models.ForeignKey(
+        SellerOrder,
+        related_name="orderitems",
+        null=True,
+        on_delete=models.CASCADE,
+        blank=True,
+    )
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     @property
     def get_total(self):
-        return self.product.price_current * self.quantity
+        price = self.product.price_current if self.unit_price is None else self.unit_price
+        return price * self.quantity
 
     class Meta:
         ordering = ["-created_at"]
@@ -136,13 +270,102 @@ class OrderItem(BaseModel):
         return str(self.product.name)
 
 
-    @property
-    def get_cart_subtotal(self):
-        orderitems = self.orderitems.all()
-        total = sum([item.get_total for item in orderitems])
-        return total
+class SalesRollup(BaseModel):
+    """
+    Sales of a seller per day and product, kept up to date at checkout and on
+    payment status changes. The row with product=None holds the seller's totals
+    for the day, where an order with several products counts once.
 
-    @property
-    def get_cart_total(self):
-        total = self.get_cart_subtotal
-        return total
\ No newline at end of file
+    Attributes:
+        seller (ForeignKey): The seller who made the sales.
+        product (ForeignKey): The product sold, None for the day totals.
+        day (date): The day the orders were placed.
+        orders (int): The number of orders.
+        units (int): The number of units sold.
+        revenue (Decimal): The sum of the item totals.
+    """
+
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name="sales")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name="sales")
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["seller", "product", "day"], condition=Q(product__isnull=False),
+                                    name="sales_rollup_product_day"),
+            models.UniqueConstraint(fields=["seller", "day"], condition=Q(product__isnull=True),
+                                    name="sales_rollup_seller_day"),
+        ]
+
+    @classmethod
+    def record(cls, order, sign=1):
+        """
+        Adds (sign=1) or takes back (sign=-1) the sales of an order, with one
+        conditional increment per rollup row; missing rows are created, and a row
+        created concurrently in the meantime is incremented instead.
+        """
+        day = timezone.localdate(order.created_at)
+        rows = (
+            order.orderitems.filter(seller_order__isnull=False).order_by()
+            .values("seller_order__seller", "product")
+            .annotate(units=Sum("quantity"), revenue=Sum(F("unit_price") * F("quantity")))
+        )
+        changes = {}
+        for row in rows:
+            seller_id = row["seller_order__seller"]
+            changes[(seller_id, row["product"])] = [1, row["units"], row["revenue"] or 0]
+            totals = changes.setdefault((seller_id, None), [1, 0, 0])
+            totals[1] += row["units"]
+            totals[2] += row["revenue"] or 0
+        for (seller_id, product_id), (orders, units, revenue) in changes.items():
+            rollup = cls.objects.filter(seller_id=seller_id, product_id=product_id, day=day)
+            increment = {
+                "orders": F("orders") + sign * orders,
+                "units": F("units") + sign * units,
+                "revenue": F("revenue") + sign * revenue,
+            }
+            if rollup.update(**increment, updated_at=timezone.now()) or sign < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        seller_id=seller_id, product_id=product_id, day=day, orders=orders, units=units,
+                        revenue=revenue,
+                    )
+            except IntegrityError:
+                # A concurrent checkout created the row between the update and the insert
+                rollup.update(**increment, updated_at=timezone.now())
+
+    @classmethod
+    def rebuild(cls, seller=None):
+        """
+        Recomputes the rollups from the order items, of one seller or of every seller.
+
+        Returns:
+            int: The number of rollup rows written.
+        """
+        items = OrderItem.objects.filter(seller_order__isnull=False).exclude(
+            order__payment_status__in=UNCOUNTED_PAYMENT_STATUSES
+        )
+        if seller is not None:
+            items = items.filter(seller_order__seller=seller)
+        items = items.order_by().annotate(day=TruncDate("order__created_at"))
+        sums = {
+            "orders": Count("order", distinct=True),
+            "units": Sum("quantity"),
+            "revenue": Sum(F("unit_price") * F("quantity")),
+        }
+        rows = [
+            cls(seller_id=row["seller_order__seller"], product_id=row.get("product"), day=row["day"],
+                orders=row["orders"], units=row["units"], revenue=row["revenue"] or 0)
+            for keys in (("seller_order__seller", "day", "product"), ("seller_order__seller", "day"))
+            for row in items.values(*keys).annotate(**sums)
+        ]
+        with transaction.atomic():
+            existing = cls.objects.all() if seller is None else cls.objects.filter(seller=seller)
+            existing.delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
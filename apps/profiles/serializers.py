@@ -1,11 +1,14 @@
 from rest_framework import serializers
 
+from apps.common.serializers import ImageVariantsField
+
 
 class ProfileSerializer(serializers.Serializer):
     first_name = serializers.CharField(max_length=25)
     last_name = serializers.CharField(max_length=25)
     email = serializers.EmailField(read_only=True)
     avatar = serializers.ImageField(required=False)
+    avatar_variants = ImageVariantsField(source="avatar")
     account_type = serializers.CharField(read_only=True)
 
 
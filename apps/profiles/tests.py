@@ -1,3 +1,44 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+
+from apps.accounts.models import User
+from apps.profiles.models import Order
+
+
+class OrderTxRefTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="Buyer", email="buyer@example.com", password="password",
+        )
+
+    def test_save_issues_no_lookup(self):
+        # Inside a transaction the INSERT runs in a savepoint
+        with self.assertNumQueries(3):  # SAVEPOINT, INSERT, RELEASE SAVEPOINT
+            order = Order.objects.create(user=self.user)
+        self.assertEqual(len(order.tx_ref), 12)
+
+    def test_save_retries_taken_code(self):
+        Order.objects.create(user=self.user, tx_ref="TAKEN")
+        with mock.patch("apps.profiles.models.generate_unique_code", side_effect=["TAKEN", "FREE"]):
+            order = Order.objects.create(user=self.user)
+        self.assertEqual(order.tx_ref, "FREE")
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderTxRefAutocommitTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="Buyer", email="buyer@example.com", password="password",
+        )
+
+    def test_save_outside_transaction_is_one_insert(self):
+        with self.assertNumQueries(1):
+            Order.objects.create(user=self.user)
+
+    def test_save_retries_taken_code(self):
+        Order.objects.create(user=self.user, tx_ref="TAKEN")
+        with mock.patch("apps.profiles.models.generate_unique_code", side_effect=["TAKEN", "FREE"]):
+            order = Order.objects.create(user=self.user)
+        self.assertEqual(order.tx_ref, "FREE")
+        self.assertEqual(Order.objects.count(), 2)
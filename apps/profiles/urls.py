@@ -1,6 +1,6 @@
 from django.urls import path
 
-from apps.profiles.views import ProfileView,OrderItemView, OrdersView, ShippingAddressesView, ShippingAddressViewID
+from apps.profiles.views import ProfileView,OrderItemView, OrderCancelView, OrdersView, ShippingAddressesView, ShippingAddressViewID
 
 urlpatterns = [
     path("", ProfileView.as_view()),
@@ -8,4 +8,5 @@ urlpatterns = [
     path("shipping_addresses/detail/<uuid:id>/", ShippingAddressViewID.as_view()),
     path("orders/", OrdersView.as_view()),
     path("orders/<str:tx_ref>/", OrderItemView.as_view()),
+    path("orders/<str:tx_ref>/cancel/", OrderCancelView.as_view()),
 ]
\ No newline at end of file
@@ -5,7 +5,10 @@ from apps.profiles.models import ShippingAddress, Order, OrderItem
 from apps.common.utils import set_dict_attr
 from apps.profiles.serializers import ProfileSerializer, ShippingAddressSerializer
 from apps.shop.serializers import OrderSerializer, CheckItemOrderSerializer
+from apps.common.paginations import CreatedCursorPagination
 from apps.common.permissions import IsOwner
+from apps.common.serializers import sparse_fieldsets
+from apps.shop.schema_examples import ORDER_LIST_PARAM_EXAMPLE
 
 tags = ["Profiles"]
 
@@ -156,22 +159,25 @@ class ShippingAddressViewID(APIView):
 class OrdersView(APIView):
     permission_classes = [IsOwner]
     serializer_class = OrderSerializer
+    pagination_class = CreatedCursorPagination
 
     @extend_schema(
         operation_id="orders_view",
         summary="Orders Fetch",
         description="""
-            This endpoint returns all orders for a particular user.
+            This endpoint returns the orders of a particular user, newest first, one cursor page at a time.
         """,
-        tags=tags
+        tags=tags,
+        parameters=ORDER_LIST_PARAM_EXAMPLE,
     )
     def get(self, request):
         user = request.user
-        orders = (Order.objects.filter(user=user)
-                  .prefetch_related("orderitems", "orderitems__product")
-                  .order_by("-created_at"))
-        serializer = self.serializer_class(orders, many=True)
-        return Response(data=serializer.data, status=200)
+        fields, _ = sparse_fieldsets(request, self.serializer_class)
+        orders = self.serializer_class.prepare(Order.objects.filter(user=user), fields)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(orders, request)
+        serializer = self.serializer_class(paginated_queryset, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class OrderItemView(APIView):
@@ -188,9 +194,35 @@ class OrderItemView(APIView):
 
     )
     def get(self, request, **kwargs):
+        order = Order.objects.only("id").get_or_none(tx_ref=kwargs["tx_ref"], user=request.user)
+        if not order:
+            return Response(data={"message": "Order does not exist!"}, status=404)
+        order_items = OrderItem.objects.filter(order=order).select_related(
+            "product__seller__user", "product__category"
+        )
+        serializer = self.serializer_class(order_items, many=True)
+        return Response(data=serializer.data, status=200)
+
+
+class OrderCancelView(APIView):
+    permission_classes = [IsOwner]
+    serializer_class = OrderSerializer
+
+    @extend_schema(
+        operation_id="order_cancel_view",
+        summary="Cancel Order",
+        description="""
+            This endpoint allows a user to cancel an order that is neither paid nor shipped.
+            The ordered quantities are put back in stock.
+        """,
+        tags=tags,
+        request=None,
+    )
+    def post(self, request, **kwargs):
         order = Order.objects.get_or_none(tx_ref=kwargs["tx_ref"])
         if not order or order.user != request.user:
             return Response(data={"message": "Order does not exist!"}, status=404)
-        order_items = OrderItem.objects.filter(order=order)
-        serializer = self.serializer_class(order_items, many=True)
-        return Response(data=serializer.data, status=200)
\ No newline at end of file
+        if not order.cancel():
+            return Response(data={"message": "Order cannot be cancelled"}, status=409)
+        serializer = self.serializer_class(order)
+        return Response(data={"message": "Order cancelled", "item": serializer.data}, status=200)
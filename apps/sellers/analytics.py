@@ -0,0 +1,78 @@
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import BigIntegerField, CharField, F
+from django.db.models.functions import Cast, Round
+
+from apps.profiles.models import SalesRollup
+from apps.shop.models import Product
+
+
+def _columns(rows):
+    """Splits (key, orders, units, revenue in cents) rows into numpy columns."""
+    if not rows:
+        return np.empty(0, dtype=object), np.zeros((3, 0), dtype=np.int64)
+    keys, *values = zip(*rows)
+    return np.asarray(keys, dtype=object), np.asarray(values, dtype=np.int64)
+
+
+def _rows(queryset, key):
+    # Casts skip the per-row UUID and Decimal converters, which dominate the fetch otherwise
+    return list(
+        queryset.annotate(key=key, cents=Cast(Round(F("revenue") * 100), BigIntegerField()))
+        .values_list("key", "orders", "units", "cents")
+    )
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def sales_report(seller, start, end):
+    """
+    Revenue, units and orders of a seller between two days (inclusive), from SalesRollup rows.
+
+    Rows are fetched as plain tuples and aggregated with NumPy: every day of the
+    range gets an entry (zeros on days without sales) and products are summed
+    over the range with bincount, so the cost stays linear in the number of rows.
+
+    Returns:
+        dict: start, end, totals, days (oldest first) and products (best selling first).
+    """
+    rollups = SalesRollup.objects.filter(seller=seller, day__range=(start, end)).order_by()
+    days, day_values = _columns(_rows(rollups.filter(product=None), F("day")))
+    offsets = np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days)) - start.toordinal()
+    series = np.zeros((3, end.toordinal() - start.toordinal() + 1), dtype=np.int64)
+    series[:, offsets] = day_values
+
+    product_keys, product_values = _columns(_rows(rollups.filter(product__isnull=False), Cast("product", CharField())))
+    keys, index = np.unique(product_keys.astype(str), return_inverse=True)
+    per_product = np.zeros((3, len(keys)), dtype=np.int64)
+    for row, column in enumerate(product_values):
+        per_product[row] = np.bincount(index, weights=column, minlength=len(keys))
+    ranking = np.lexsort((-per_product[1], -per_product[2]))
+    ids = [uuid.UUID(key) for key in keys.tolist()]
+    names = {
+        pk: (slug, name)
+        for pk, slug, name in Product.objects.unfiltered().filter(pk__in=ids).values_list("id", "slug", "name")
+    }
+
+    totals = series.sum(axis=1)
+    return {
+        "start": start,
+        "end": end,
+        "totals": {"orders": int(totals[0]), "units": int(totals[1]), "revenue": _money(totals[2])},
+        "days": [
+            {"day": date.fromordinal(start.toordinal() + offset), "orders": orders, "units": units,
+             "revenue": _money(revenue)}
+            for offset, (orders, units, revenue) in enumerate(series.T.tolist())
+        ],
+        "products": [
+            {"slug": names[ids[i]][0], "name": names[ids[i]][1], "orders": orders, "units": units,
+             "revenue": _money(revenue)}
+            for i, (orders, units, revenue) in zip(ranking.tolist(), per_product.T[ranking].tolist())
+            if ids[i] in names
+        ],
+    }
@@ -1,11 +1,14 @@
 from django.urls import path
 
-from apps.sellers.views import SellersView, SellerOrderItemView, SellerOrdersView, SellerProductsView, SellerProductView
+from apps.sellers.views import SellersView, SellerOrderItemView, SellerOrdersView, SellerProductsView, SellerProductsImportView, SellerProductsBulkUpdateView, SellerProductView, SellerSalesView
 
 urlpatterns = [
     path("", SellersView.as_view()),
     path("products/", SellerProductsView.as_view()),
+    path("products/import/", SellerProductsImportView.as_view()),
+    path("products/bulk/", SellerProductsBulkUpdateView.as_view()),
     path("products/<slug:slug>/", SellerProductView.as_view()),
     path("orders/", SellerOrdersView.as_view()),
+    path("analytics/sales/", SellerSalesView.as_view()),
     path("orders/<str:tx_ref>/", SellerOrderItemView.as_view()),
 ]
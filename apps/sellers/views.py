@@ -1,12 +1,26 @@
+from django.db import transaction
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from apps.shop.models import Category, Product
 from apps.sellers.models import Seller
 from apps.sellers.serializers import SellerSerializer
-from apps.shop.serializers import ProductSerializer, CreateProductSerializer, OrderSerializer, CheckItemOrderSerializer
+from apps.shop.serializers import ProductSerializer, CreateProductSerializer, SellerOrderSerializer, \
+    CheckItemOrderSerializer
 from apps.common.utils import set_dict_attr
-from apps.profiles.models import Order, OrderItem
+from apps.profiles.models import OrderItem, SellerOrder
+from apps.common.paginations import CustomPagination, CreatedCursorPagination
+from apps.common.streaming import ndjson_response, wants_ndjson
+from apps.common.serializers import sparse_fieldsets
+from apps.shop.schema_examples import ORDER_LIST_PARAM_EXAMPLE, SALES_PARAM_EXAMPLE
+from apps.shop.schema_examples import PRODUCT_LIST_PARAM_EXAMPLE
+from apps.shop.fast_serializers import FastProductSerializer
+from apps.shop.importers import ProductImporter, import_format, iter_csv, iter_jsonl, text_stream
+from apps.shop.serializers import ImportProductsSerializer, ImportProductsResultSerializer
+from apps.shop.serializers import BulkUpdateProductSerializer, BulkUpdateProductResultSerializer
+from apps.shop.serializers import SalesParamsSerializer, SalesReportSerializer
+from apps.sellers.analytics import sales_report
 
 
 tags = ["Sellers"]
@@ -39,6 +53,8 @@ class SellersView(APIView):
 
 class SellerProductsView(APIView):
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
+    pagination_class = CustomPagination
 
     @extend_schema(
         summary="Seller Products Fetch",
@@ -47,14 +63,20 @@ class SellerProductsView(APIView):
             Products can be filtered by name, sizes or colors.
         """,
         tags=tags,
+        parameters=PRODUCT_LIST_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
         seller = Seller.objects.get_or_none(user=request.user, is_approved=True)
         if not seller:
             return Response(data={"message": "Access is denied"}, status=403)
-        products = Product.objects.select_related("category", "seller", "seller__user").filter(seller=seller)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+        products = self.read_serializer_class.prepare(Product.objects.filter(seller=seller), fields, expand)
+        if wants_ndjson(request):
+            return ndjson_response(products, self.read_serializer_class, fields=fields, expand=expand)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(products, request)
+        serializer = self.read_serializer_class(paginated_queryset, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary="Create a product",
@@ -85,6 +107,91 @@ class SellerProductsView(APIView):
             return Response(serializer.errors, status=400)
 
 
+class SellerProductsImportView(APIView):
+    serializer_class = ImportProductsSerializer
+    readers = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+    @extend_schema(
+        summary="Bulk import products",
+        description="""
+            This endpoint allows a seller to import many products from one CSV or JSON Lines file.
+            Every row has name, desc, price_current, category_slug, in_stock and image1-3 paths.
+            Valid rows are created, invalid rows are listed with their errors.
+        """,
+        tags=tags,
+        request={"multipart/form-data": ImportProductsSerializer},
+        responses=ImportProductsResultSerializer,
+    )
+    def post(self, request, *args, **kwargs):
+        seller = Seller.objects.get_or_none(user=request.user, is_approved=True)
+        if not seller:
+            return Response(data={"message": "Access is denied"}, status=403)
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=400)
+        file = serializer.validated_data["file"]
+        file_format = import_format(file.name)
+        if not file_format:
+            return Response(data={"message": "Only .csv and .jsonl files are supported"}, status=400)
+        rows = self.readers[file_format](text_stream(file))
+        report = ProductImporter(seller).run(rows)
+        return Response(data=ImportProductsResultSerializer(report).data, status=200)
+
+
+class SellerProductsBulkUpdateView(APIView):
+    serializer_class = BulkUpdateProductSerializer
+
+    @extend_schema(
+        summary="Bulk update prices and stock",
+        description="""
+            This endpoint allows a seller to change the price and/or stock of many products at once.
+            Either every product is updated or none: unknown slugs return 404,
+            products of another seller return 403.
+        """,
+        tags=tags,
+        request=BulkUpdateProductSerializer(many=True),
+        responses=BulkUpdateProductResultSerializer,
+    )
+    def patch(self, request, *args, **kwargs):
+        seller = Seller.objects.get_or_none(user=request.user, is_approved=True)
+        if not seller:
+            return Response(data={"message": "Access is denied"}, status=403)
+        serializer = self.serializer_class(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=400)
+        changes = {item["slug"]: item for item in serializer.validated_data}
+        if len(changes) != len(serializer.validated_data):
+            return Response(data={"message": "Every slug must appear only once"}, status=400)
+        with transaction.atomic():
+            # One query checks every slug and its owner
+            products = list(
+                Product.objects.select_for_update()
+                .filter(slug__in=changes)
+                .only("id", "slug", "seller_id", "price_current", "price_old", "in_stock")
+            )
+            missing = changes.keys() - {product.slug for product in products}
+            if missing:
+                return Response(data={"message": "Products do not exist!", "slugs": sorted(missing)}, status=404)
+            foreign = [product.slug for product in products if product.seller_id != seller.id]
+            if foreign:
+                return Response(data={"message": "Access is denied", "slugs": sorted(foreign)}, status=403)
+            now = timezone.now()
+            for product in products:
+                item = changes[product.slug]
+                if "price_current" in item:
+                    # Same price_old handling as SellerProductView.put
+                    if not product.price_current == item["price_current"]:
+                        product.price_old = item["price_current"]
+                    product.price_current = item["price_current"]
+                if "in_stock" in item:
+                    product.in_stock = item["in_stock"]
+                product.updated_at = now
+            Product.objects.bulk_update(
+                products, ["price_current", "price_old", "in_stock", "updated_at"], batch_size=500
+            )
+        return Response(data={"updated": len(products)}, status=200)
+
+
 class SellerProductView(APIView):
     serializer_class = CreateProductSerializer
 
@@ -143,24 +250,51 @@ class SellerProductView(APIView):
 
 
 
+class SellerSalesView(APIView):
+    serializer_class = SalesReportSerializer
+
+    @extend_schema(
+        summary="Seller Sales Analytics",
+        description="""
+            This endpoint returns the revenue, units and orders of a seller per day and per product
+            between two days. Cancelled and failed orders are not counted.
+        """,
+        tags=tags,
+        parameters=SALES_PARAM_EXAMPLE,
+    )
+    def get(self, request):
+        seller = Seller.objects.get_or_none(user=request.user, is_approved=True)
+        if not seller:
+            return Response(data={"message": "Access is denied"}, status=403)
+        params = SalesParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        report = sales_report(seller, params.validated_data["start"], params.validated_data["end"])
+        serializer = self.serializer_class(report)
+        return Response(data=serializer.data, status=200)
+
+
 class SellerOrdersView(APIView):
-    serializer_class = OrderSerializer
+    serializer_class = SellerOrderSerializer
+    pagination_class = CreatedCursorPagination
 
     @extend_schema(
         operation_id="seller_orders_view",
         summary="Seller Orders Fetch",
         description="""
-            This endpoint returns all orders for a particular seller.
+            This endpoint returns the orders of a particular seller, newest first, one cursor page at a time.
+            Every order only covers the items of that seller, with their own totals and delivery status.
         """,
-        tags=tags
+        tags=tags,
+        parameters=ORDER_LIST_PARAM_EXAMPLE,
     )
     def get(self, request):
         seller = request.user.seller
-        orders = (
-            Order.objects.filter(orderitems__product__seller=seller).order_by("-created_at")
-        )
-        serializer = self.serializer_class(orders, many=True)
-        return Response(data=serializer.data, status=200)
+        fields, _ = sparse_fieldsets(request, self.serializer_class)
+        orders = self.serializer_class.prepare(SellerOrder.objects.filter(seller=seller), fields)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(orders, request)
+        serializer = self.serializer_class(paginated_queryset, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
 
 
 
@@ -178,10 +312,12 @@ class SellerOrderItemView(APIView):
     )
     def get(self, request, **kwargs):
         seller = request.user.seller
-        order = Order.objects.get_or_none(tx_ref=kwargs["tx_ref"])
-        if not order:
+        seller_order = SellerOrder.objects.only("id").get_or_none(order__tx_ref=kwargs["tx_ref"], seller=seller)
+        if not seller_order:
             return Response(data={"message": "Order does not exist!"}, status=404)
-        order_items = OrderItem.objects.filter(order=order, product__seller=seller)
+        order_items = OrderItem.objects.filter(seller_order=seller_order).select_related(
+            "product__seller__user", "product__category"
+        )
         serializer = self.serializer_class(order_items, many=True)
         return Response(data=serializer.data, status=200)
 
@@ -4,3 +4,29 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.shop'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate, post_save
+        from apps.accounts.models import User
+        from apps.common.cache import invalidate_model, track_model_versions
+        from apps.common.images import track_images
+        from apps.sellers.models import Seller
+        from apps.shop.models import Category, Product, Review
+        from apps.shop.search import ensure_search_index
+
+        post_migrate.connect(ensure_search_index, sender=self)
+
+        # Every model that public catalog responses are cached against
+        track_model_versions(Product, Category, Seller, Review)
+
+        # The seller's avatar is the only user field in the catalog: signups and
+        # buyer profile saves leave the cached responses alone
+        def invalidate_seller(sender, instance, update_fields=None, **kwargs):
+            if instance.account_type == "SELLER" and (update_fields is None or "avatar" in update_fields):
+                invalidate_model(Seller)
+
+        post_save.connect(invalidate_seller, sender=User, weak=False, dispatch_uid="version-save-seller-user")
+
+        # Thumbnails and WebP variants are rendered in the background on upload
+        track_images(Product, "image1", "image2", "image3")
+        track_images(Category, "image")
@@ -0,0 +1,287 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+
+from apps.common.cache import cache_lock
+from apps.profiles.models import OrderItem
+from apps.shop.fast_serializers import FastOrderItemSerializer
+from apps.shop.models import Product
+
+logger = logging.getLogger(__name__)
+
+# Unsaved changes only live in this cache, it must not evict entries (see CACHES)
+CART_CACHE = "carts"
+# A saved cart can be reloaded from the database, it is kept this many seconds after the last use
+CLEAN_CART_TIMEOUT = 60 * 60 * 24
+
+cart_cache = ConnectionProxy(caches, CART_CACHE)
+
+CART_KEY = "cart:{}"
+CART_LOCK_KEY = "cart-lock:{}"
+# Dirty carts: a (slot, changed at) marker per cart and a queue of user ids in numbered
+# slots, appended with an atomic incr and read from the head by the flusher
+DIRTY_KEY = "cart-dirty:{}"
+DIRTY_SLOT_KEY = "cart-dirty-slot:{}"
+DIRTY_TAIL_KEY = "cart-dirty:tail"
+DIRTY_HEAD_KEY = "cart-dirty:head"
+DIRTY_STALLED_KEY = "cart-dirty:stalled"
+DIRTY_READ_SIZE = 500
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+class CartStore:
+    """
+    The active cart of a user (OrderItem rows with order=None), kept in the carts cache.
+
+    Reads and writes go to a cached {product id: quantity} map. Changes reach
+    the database in one batch per cart (delete, bulk_create, bulk_update) when
+    the cart is flushed: before checkout and from the background flusher, at
+    most CART_FLUSH_INTERVAL seconds after the first unsaved change. Every
+    operation holds the per-user cart lock, so it works across threads and,
+    with a shared cache backend, across processes.
+
+    Args:
+        user_id: The primary key of the cart owner.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.key = CART_KEY.format(user_id)
+
+    def lock(self):
+        return cache_lock(CART_LOCK_KEY.format(self.user_id), alias=CART_CACHE)
+
+    def load(self):
+        state = cart_cache.get(self.key)
+        if state is None:
+            rows = (
+                OrderItem.objects.filter(user_id=self.user_id, order=None)
+                .order_by("created_at")
+                .values_list("product_id", "quantity")
+            )
+            state = {"items": dict(rows), "dirty": False}
+            self.store(state)
+        return state
+
+    def store(self, state):
+        # Unsaved changes never expire
+        cart_cache.set(self.key, state, timeout=None if state["dirty"] else CLEAN_CART_TIMEOUT)
+
+    def items(self):
+        """Returns {product id: quantity}, oldest item first."""
+        with self.lock():
+            return dict(self.load()["items"])
+
+    def set_quantities(self, quantities):
+        """
+        Sets the quantity of several products at once, 0 removes the product.
+
+        Returns:
+            dict: {product id: "added", "updated" or "removed"}.
+        """
+        with self.lock():
+            state = self.load()
+            items = state["items"]
+            changes = {}
+            for product_id, quantity in quantities.items():
+                if quantity == 0:
+                    items.pop(product_id, None)
+                    changes[product_id] = "removed"
+                else:
+                    changes[product_id] = "updated" if product_id in items else "added"
+                    items[product_id] = quantity
+            was_dirty, state["dirty"] = state["dirty"], True
+            self.store(state)
+            if not was_dirty:
+                mark_dirty(self.user_id)
+        return changes
+
+    def discard(self, product_ids):
+        """Drops products removed from the database from the cached cart, so that a flush does not write them back."""
+        with self.lock():
+            state = cart_cache.get(self.key)
+            if state is None:
+                return
+            for product_id in product_ids:
+                state["items"].pop(product_id, None)
+            self.store(state)
+
+    def flush(self):
+        with self.lock():
+            self.write()
+
+    @contextmanager
+    def flushed(self):
+        """
+        Holds the cart lock with every change saved, for code that reads or
+        converts the OrderItem rows (checkout). The cached cart is dropped
+        afterwards and reloaded from the database on next use.
+        """
+        with self.lock():
+            self.write()
+            try:
+                yield
+            finally:
+                cart_cache.delete(self.key)
+
+    def write(self):
+        # Caller holds the cart lock
+        state = cart_cache.get(self.key)
+        if state is None or not state["dirty"]:
+            return
+        # Unregister first: a change made after this write registers the cart again
+        unmark_dirty(self.user_id)
+        try:
+            self.save_items(state["items"])
+        except Exception:
+            mark_dirty(self.user_id)
+            raise
+        state["dirty"] = False
+        self.store(state)
+
+    def save_items(self, items):
+        stale, to_update = [], []
+        rows = {}
+        for row in OrderItem.objects.filter(user_id=self.user_id, order=None):
+            if row.product_id in rows:
+                stale.append(row.pk)
+            else:
+                rows[row.product_id] = row
+        now = timezone.now()
+        to_create = []
+        for product_id, quantity in items.items():
+            row = rows.pop(product_id, None)
+            if row is None:
+                to_create.append(OrderItem(user_id=self.user_id, product_id=product_id, quantity=quantity))
+            elif row.quantity != quantity:
+                row.quantity, row.updated_at = quantity, now
+                to_update.append(row)
+        stale.extend(row.pk for row in rows.values())
+        with transaction.atomic():
+            if stale:
+                OrderItem.objects.filter(pk__in=stale).delete()
+            OrderItem.objects.bulk_create(to_create)
+            OrderItem.objects.bulk_update(to_update, ["quantity", "updated_at"])
+
+
+def mark_dirty(user_id):
+    """Queues a cart for the flusher, unless it is queued already. No lock is taken."""
+    try:
+        slot = cart_cache.incr(DIRTY_TAIL_KEY)
+    except ValueError:
+        cart_cache.add(DIRTY_TAIL_KEY, 0, timeout=None)
+        slot = cart_cache.incr(DIRTY_TAIL_KEY)
+    # Marker first: once the slot is written the flusher can trust the marker. A cart
+    # marked already keeps its older slot, this one is skipped
+    cart_cache.add(DIRTY_KEY.format(user_id), (slot, time.time()), timeout=None)
+    cart_cache.set(DIRTY_SLOT_KEY.format(slot), user_id, timeout=None)
+    start_flusher()
+
+
+def unmark_dirty(user_id):
+    cart_cache.delete(DIRTY_KEY.format(user_id))
+
+
+def flush_dirty_carts(older_than=0):
+    """
+    Saves the carts with changes older than `older_than` seconds.
+
+    The queue is read in order from the head, a run stops at the first cart changed
+    more recently and the next one resumes there.
+
+    Returns:
+        int: The number of carts flushed.
+    """
+    since = time.time() - older_than
+    head = cart_cache.get(DIRTY_HEAD_KEY, 0)
+    tail = cart_cache.get(DIRTY_TAIL_KEY, 0)
+    flushed = 0
+    try:
+        for start in range(head + 1, tail + 1, DIRTY_READ_SIZE):
+            slots = range(start, min(start + DIRTY_READ_SIZE, tail + 1))
+            users = cart_cache.get_many([DIRTY_SLOT_KEY.format(slot) for slot in slots])
+            for slot in slots:
+                user_id = users.get(DIRTY_SLOT_KEY.format(slot))
+                if user_id is None:
+                    # Taken by a mark_dirty that has not written it yet. One that died in
+                    # between leaves it empty for good: skip it on the next run
+                    if cart_cache.get(DIRTY_STALLED_KEY) != slot:
+                        cart_cache.set(DIRTY_STALLED_KEY, slot, timeout=None)
+                        return flushed
+                else:
+                    marker = cart_cache.get(DIRTY_KEY.format(user_id))
+                    if marker is not None and marker[0] == slot:
+                        if marker[1] > since:
+                            return flushed
+                        CartStore(user_id).flush()
+                        flushed += 1
+                    cart_cache.delete(DIRTY_SLOT_KEY.format(slot))
+                head = slot
+    finally:
+        cart_cache.set(DIRTY_HEAD_KEY, head, timeout=None)
+    return flushed
+
+
+def start_flusher():
+    """Starts this process' background flusher once, unless CART_FLUSH_INTERVAL is None."""
+    global _flusher
+    if settings.CART_FLUSH_INTERVAL is None:
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_forever, name="cart-flusher", daemon=True)
+            _flusher.start()
+
+
+def _flush_forever():
+    while settings.CART_FLUSH_INTERVAL is not None:
+        time.sleep(settings.CART_FLUSH_INTERVAL)
+        try:
+            flush_dirty_carts(older_than=settings.CART_FLUSH_INTERVAL)
+        except Exception:
+            logger.exception("Cannot flush the cached carts")
+        finally:
+            close_old_connections()
+
+
+# Product columns a FastOrderItemSerializer row reads, without the "product__" prefix
+CART_PRODUCT_VALUES = tuple(dict.fromkeys(
+    path[len("product__"):]
+    for paths in FastOrderItemSerializer.field_values.values()
+    for path in paths
+    if path.startswith("product__")
+))
+
+
+def cart_row(product, quantity):
+    """A FastOrderItemSerializer row built from Product values and a quantity."""
+    row = {f"product__{name}": value for name, value in product.items()}
+    row["quantity"] = quantity
+    return row
+
+
+def cart_rows(items, fields=None, expand=None):
+    """
+    FastOrderItemSerializer rows of a cached cart, newest item first like the
+    OrderItem ordering, with one product query.
+    """
+    paths = {path for _, key_paths in FastOrderItemSerializer.selected(fields, expand) for path in key_paths}
+    product_values = [path[len("product__"):] for path in paths if path.startswith("product__")]
+    products = {
+        product.pop("id"): product
+        for product in Product.objects.unfiltered().filter(pk__in=items).values("id", *product_values)
+    }
+    return [
+        cart_row(products[product_id], items[product_id])
+        for product_id in reversed(list(items))
+        if product_id in products
+    ]
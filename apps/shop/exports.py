@@ -0,0 +1,49 @@
+from itertools import chain
+
+from apps.common.streaming import iter_gzip, iter_ndjson
+from apps.shop.fast_serializers import ProductExportSerializer, ProductTombstoneSerializer
+from apps.shop.models import Product
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_queryset(updated_since=None):
+    """
+    Live products with their seller and category, oldest change first.
+
+    Only product writes bump updated_at: an incremental export does not pick up
+    products whose seller or category changed since, a full export does.
+
+    Args:
+        updated_since (datetime): Only products updated at or after this moment.
+    """
+    queryset = Product.objects.all()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return ProductExportSerializer.prepare(queryset).order_by("updated_at", "id")
+
+
+def deleted_queryset(deleted_since):
+    """
+    Products soft deleted at or after `deleted_since`, served by the partial product_deleted index.
+
+    Purged products are gone from the table, an export older than SOFT_DELETE_RETENTION_DAYS
+    must be replaced by a full one.
+    """
+    queryset = Product.objects.unfiltered().filter(is_deleted=True, deleted_at__gte=deleted_since)
+    return queryset.order_by("deleted_at", "id").values("id", "slug", "is_deleted")
+
+
+def iter_export(updated_since=None, compression=None, chunk_size=EXPORT_CHUNK_SIZE, context=None):
+    """
+    Yields the catalog export as NDJSON text chunks, or gzip bytes with compression="gzip".
+
+    An incremental export (updated_since) ends with a {"id", "slug", "deleted": true}
+    line per product deleted since.
+    """
+    chunks = iter_ndjson(export_queryset(updated_since), ProductExportSerializer, chunk_size, context=context)
+    if updated_since is not None:
+        chunks = chain(chunks, iter_ndjson(deleted_queryset(updated_since), ProductTombstoneSerializer, chunk_size))
+    if compression == "gzip":
+        return iter_gzip(chunks)
+    return chunks
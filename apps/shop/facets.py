@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Count, DecimalField, F, Value, When
+from django.db.models.functions import Floor
+
+
+def product_facets(queryset, bucket_size):
+    """
+    Computes the catalog facets of a filtered Product queryset in one grouped query.
+
+    Rows are grouped by (category, price bucket, in stock) and folded into the
+    three facets in Python, the number of groups is small whatever the catalog size.
+
+    Args:
+        queryset (QuerySet): The Product queryset with the current filters applied.
+        bucket_size (int): The width of a price bucket.
+
+    Returns:
+        dict: total, categories, price and in_stock facet counts.
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(
+            price_bucket=Floor(F("price_current") / Value(Decimal(bucket_size), output_field=DecimalField())),
+            available=Case(When(in_stock__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        )
+        .values("category__slug", "category__name", "price_bucket", "available")
+        .annotate(count=Count("pk"))
+    )
+
+    total = 0
+    categories, buckets = {}, {}
+    in_stock = {"in_stock": 0, "out_of_stock": 0}
+    for row in rows:
+        count = row["count"]
+        total += count
+        category = categories.setdefault(
+            row["category__slug"], {"slug": row["category__slug"], "name": row["category__name"], "count": 0}
+        )
+        category["count"] += count
+        bucket = int(row["price_bucket"])
+        buckets[bucket] = buckets.get(bucket, 0) + count
+        in_stock["in_stock" if row["available"] else "out_of_stock"] += count
+
+    return {
+        "total": total,
+        "categories": sorted(categories.values(), key=lambda c: (-c["count"], c["name"])),
+        "price": [
+            {"min": bucket * bucket_size, "max": (bucket + 1) * bucket_size, "count": buckets[bucket]}
+            for bucket in sorted(buckets)
+        ],
+        "in_stock": in_stock,
+    }
@@ -0,0 +1,219 @@
+from apps.accounts.models import User
+from apps.common.serializers import ValuesSerializer, decimal_representation
+from apps.shop.models import Category, Product
+
+SELLER_FIELDS = (
+    "business_name",
+    "slug",
+    "inn_identification_number",
+    "website_url",
+    "phone_number",
+    "business_description",
+    "business_address",
+    "city",
+    "postal_code",
+    "bank_name",
+    "bank_bic_number",
+    "bank_account_number",
+    "bank_routing_number",
+)
+
+PRODUCT_IMAGES = [Product._meta.get_field(name) for name in ("image1", "image2", "image3")]
+CATEGORY_IMAGE = Category._meta.get_field("image")
+USER_AVATAR = User._meta.get_field("avatar")
+
+
+def text(value):
+    return None if value is None else str(value)
+
+
+class FastProductSerializer(ValuesSerializer):
+    """Values-row twin of ProductSerializer."""
+
+    field_values = {
+        "seller": ("seller", "seller__business_name", "seller__slug", "seller__user__avatar"),
+        "name": ("name",),
+        "slug": ("slug",),
+        "desc": ("desc",),
+        "price_old": ("price_old",),
+        "price_current": ("price_current",),
+        "category": ("category__name", "category__slug", "category__image"),
+        "in_stock": ("in_stock",),
+        "image1": ("image1",),
+        "image2": ("image2",),
+        "image3": ("image3",),
+        "image1_variants": ("image1",),
+        "image2_variants": ("image2",),
+        "image3_variants": ("image3",),
+        "average_rating": ("average_rating",),
+    }
+    relations = {"seller": "seller__slug", "category": "category__slug"}
+    always_values = ("id", "created_at", "price_current")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Many rows share a seller and a category, render each of them once
+        self.sellers = {}
+        self.categories = {}
+
+    def get_seller(self, row):
+        if row["seller"] is None:
+            return None
+        key = (row["seller"], row["seller__business_name"], row["seller__slug"], row["seller__user__avatar"])
+        seller = self.sellers.get(key)
+        if seller is None:
+            seller = self.sellers[key] = {
+                "name": row["seller__business_name"],
+                "slug": text(row["seller__slug"]),
+                # CharField over a FieldFile renders its name, '' when empty
+                "avatar": row["seller__user__avatar"] or "",
+            }
+        return seller
+
+    def get_price_old(self, row):
+        return decimal_representation(row["price_old"])
+
+    def get_price_current(self, row):
+        return decimal_representation(row["price_current"])
+
+    def get_category(self, row):
+        key = (row["category__name"], row["category__slug"], row["category__image"])
+        category = self.categories.get(key)
+        if category is None:
+            category = self.categories[key] = {
+                "name": row["category__name"],
+                "slug": row["category__slug"],
+                "image": self.file_url(CATEGORY_IMAGE, row["category__image"]),
+                "image_variants": self.image_variants(row["category__image"]),
+            }
+        return category
+
+    def get_image1(self, row):
+        return self.file_url(PRODUCT_IMAGES[0], row["image1"])
+
+    def get_image2(self, row):
+        return self.file_url(PRODUCT_IMAGES[1], row["image2"])
+
+    def get_image3(self, row):
+        return self.file_url(PRODUCT_IMAGES[2], row["image3"])
+
+    def get_image1_variants(self, row):
+        return self.image_variants(row["image1"])
+
+    def get_image2_variants(self, row):
+        return self.image_variants(row["image2"])
+
+    def get_image3_variants(self, row):
+        return self.image_variants(row["image3"])
+
+    def get_average_rating(self, row):
+        return float(row["average_rating"])
+
+
+class FastOrderItemSerializer(ValuesSerializer):
+    """Values-row twin of OrderItemSerializer."""
+
+    field_values = {
+        "product": (
+            "product__seller",
+            *(f"product__seller__{field}" for field in SELLER_FIELDS),
+            "product__seller__is_approved",
+            "product__name",
+            "product__slug",
+            "product__price_current",
+        ),
+        "quantity": ("quantity",),
+        "total": ("product__price_current", "quantity"),
+    }
+    relations = {"product": "product__slug"}
+
+    def get_product(self, row):
+        if row["product__seller"] is None:
+            seller = None
+        else:
+            seller = {field: text(row[f"product__seller__{field}"]) for field in SELLER_FIELDS}
+            seller["is_approved"] = bool(row["product__seller__is_approved"])
+        return {
+            "seller": seller,
+            "name": row["product__name"],
+            "slug": row["product__slug"],
+            "price": decimal_representation(row["product__price_current"]),
+        }
+
+    def get_total(self, row):
+        return decimal_representation(row["product__price_current"] * row["quantity"])
+
+
+class FastReviewSerializer(ValuesSerializer):
+    """Values-row twin of ReviewSerializer."""
+
+    field_values = {
+        "review_id": ("id",),
+        "product_name": ("product__name",),
+        "product_id": ("product__id",),
+        "user": ("user__first_name", "user__last_name", "user__email", "user__avatar", "user__account_type"),
+        "rating": ("rating",),
+        "text": ("text",),
+        "create_review": ("created_at",),
+    }
+    relations = {"user": "user__email"}
+
+    def get_review_id(self, row):
+        return str(row["id"])
+
+    def get_product_id(self, row):
+        return str(row["product__id"])
+
+    def get_user(self, row):
+        return {
+            "first_name": text(row["user__first_name"]),
+            "last_name": text(row["user__last_name"]),
+            "email": row["user__email"],
+            "avatar": self.file_url(USER_AVATAR, row["user__avatar"]),
+            "avatar_variants": self.image_variants(row["user__avatar"]),
+            "account_type": row["user__account_type"],
+        }
+
+    def get_create_review(self, row):
+        return str(row["created_at"])
+
+
+def datetime_representation(value):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class ProductExportSerializer(FastProductSerializer):
+    """Values-row twin of ExportProductSerializer, the catalog export rows."""
+
+    field_values = {
+        "id": ("id",),
+        **FastProductSerializer.field_values,
+        "created_at": ("created_at",),
+        "updated_at": ("updated_at",),
+    }
+
+    def get_id(self, row):
+        return str(row["id"])
+
+    def get_created_at(self, row):
+        return datetime_representation(row["created_at"])
+
+    def get_updated_at(self, row):
+        return datetime_representation(row["updated_at"])
+
+
+class ProductTombstoneSerializer(ValuesSerializer):
+    """The export line of a product soft deleted since the previous export."""
+
+    field_values = {
+        "id": ("id",),
+        "slug": ("slug",),
+        "deleted": ("is_deleted",),
+    }
+
+    def get_id(self, row):
+        return str(row["id"])
@@ -1,18 +1,35 @@
 import django_filters
 
 from apps.shop.models import Product, Review
+from apps.shop.search import search_products
 
 
 class ProductFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method='filter_search')
     max_price = django_filters.NumberFilter(field_name='price_current', lookup_expr='lte')
     min_price = django_filters.NumberFilter(field_name='price_current', lookup_expr='gte')
     in_stock = django_filters.NumberFilter(lookup_expr='gte')
     created_at = django_filters.DateTimeFilter(lookup_expr='gte')
 
+    ordering = django_filters.OrderingFilter(
+        fields=(
+            ('average_rating', 'rating'),
+            ('price_current', 'price'),
+            ('created_at', 'created_at'),
+        )
+    )
+
     class Meta:
         model = Product
         fields = ['max_price', 'min_price', 'in_stock', 'created_at']
 
+    def filter_search(self, queryset, name, value):
+        queryset = search_products(queryset, value)
+        if 'search_rank' in queryset.query.annotations:
+            # Best matches first unless ?ordering= overrides it
+            queryset = queryset.order_by('search_rank')
+        return queryset
+
 
 class ReviewFilter(django_filters.FilterSet):
     min_rating = django_filters.NumberFilter(field_name="rating", lookup_expr='gte')
@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+import os
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from apps.shop.models import Category, Product
+from apps.shop.serializers import ImportProductSerializer
+
+IMPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def iter_csv(stream):
+    """
+    Yields (row number, row) pairs of a CSV file with a header line.
+    Empty cells are dropped so optional columns fall back to their defaults.
+    """
+    for number, row in enumerate(csv.DictReader(stream), start=1):
+        yield number, {key: value for key, value in row.items() if key and value not in ("", None)}
+
+
+def iter_jsonl(stream):
+    """
+    Yields (row number, row) pairs of a JSON Lines file, one object per line.
+    Lines that are not a JSON object are yielded as None.
+    """
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def import_format(filename):
+    """Returns the import format of a file name from its extension, None when it is unsupported."""
+    return IMPORT_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def text_stream(file):
+    """Wraps a binary file (upload or open file) for streaming text reads."""
+    return io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+
+class SlugAllocator:
+    """
+    Hands out unique product slugs in memory, the same way AutoSlugField would.
+
+    Slugs are checked against the database once per batch instead of once per row:
+    one `slug IN (...)` lookup, then one range scan of "<base>-*" slugs for the bases
+    that are already taken or repeated in the import.
+    """
+
+    range_chunk_size = 200
+
+    def __init__(self):
+        self.field = Product._meta.get_field("slug")
+        self.queryset = Product.objects.unfiltered().order_by()
+        self.taken = set()
+        self.checked = set()
+        self.scanned = set()
+        self.next_index = {}
+
+    def base_slug(self, name):
+        field = self.field
+        slug = field.slugify(name) or Product._meta.model_name
+        return field.slugify(slug[:field.max_length])
+
+    def reserve(self, bases):
+        """Loads the existing slugs that may collide with the given base slugs."""
+        counts = Counter(bases)
+        unchecked = {base for base in counts if base not in self.checked}
+        if unchecked:
+            self.taken.update(self.queryset.filter(slug__in=unchecked).values_list("slug", flat=True))
+            self.checked.update(unchecked)
+        to_scan = [
+            base for base, count in counts.items()
+            if base not in self.scanned and (count > 1 or base in self.taken)
+        ]
+        for start in range(0, len(to_scan), self.range_chunk_size):
+            chunk = to_scan[start:start + self.range_chunk_size]
+            # "-" sorts right before ".", so this range is every "<base>-..." slug
+            lookup = Q()
+            for base in chunk:
+                lookup |= Q(slug__gt=f"{base}-", slug__lt=f"{base}.")
+            self.taken.update(self.queryset.filter(lookup).values_list("slug", flat=True))
+            self.scanned.update(chunk)
+
+    def allocate(self, base):
+        """Returns the first free slug for a reserved base slug and marks it as taken."""
+        slug = base
+        index = self.next_index.get(base, 1)
+        while slug in self.taken:
+            index += 1
+            tail = f"{self.field.index_sep}{index}"
+            slug = f"{base[:self.field.max_length - len(tail)]}{tail}"
+        self.next_index[base] = index
+        self.taken.add(slug)
+        return slug
+
+
+class ProductImporter:
+    """
+    Bulk imports the products of a seller from a stream of rows.
+
+    Categories are resolved from one prefetched slug map, slugs are allocated
+    in memory by a SlugAllocator and rows are inserted with bulk_create, one
+    transaction per batch. A batch that still hits a constraint is retried row
+    by row so only the offending rows are reported.
+
+    Args:
+        seller (Seller): The seller owning the imported products.
+        batch_size (int): The number of rows inserted per bulk_create.
+    """
+
+    def __init__(self, seller, batch_size=1000):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.values_list("slug", "id"))
+        self.slugs = SlugAllocator()
+
+    def run(self, rows):
+        """
+        Imports (row number, row) pairs, as yielded by iter_csv or iter_jsonl.
+
+        Returns:
+            dict: The number of created and failed rows and the errors of each failed row.
+        """
+        report = {"created": 0, "failed": 0, "errors": []}
+        # One serializer validates every row, binding its fields per row dominates otherwise
+        serializer = ImportProductSerializer(context={"categories": self.categories})
+        batch = []
+        for number, row in rows:
+            if row is None:
+                self.add_error(report, number, {"non_field_errors": ["Invalid row."]})
+                continue
+            try:
+                data = serializer.run_validation(row)
+            except ValidationError as exc:
+                self.add_error(report, number, exc.detail)
+                continue
+            batch.append((number, self.build(data)))
+            if len(batch) >= self.batch_size:
+                self.flush(batch, report)
+                batch = []
+        if batch:
+            self.flush(batch, report)
+        return report
+
+    def build(self, data):
+        category_slug = data.pop("category_slug")
+        return Product(seller=self.seller, category_id=self.categories[category_slug], **data)
+
+    def flush(self, batch, report):
+        products = [product for _, product in batch]
+        bases = [self.slugs.base_slug(product.name) for product in products]
+        self.slugs.reserve(bases)
+        for product, base in zip(products, bases):
+            product.slug = self.slugs.allocate(base)
+            product._slug_is_unique = True
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+            report["created"] += len(products)
+        except IntegrityError:
+            # A slug was taken concurrently, let AutoSlugField pick them one by one
+            for number, product in batch:
+                product.slug, product._slug_is_unique = "", False
+                try:
+                    with transaction.atomic():
+                        product.save(force_insert=True)
+                    report["created"] += 1
+                except IntegrityError as exc:
+                    self.add_error(report, number, {"non_field_errors": [str(exc)]})
+
+    @staticmethod
+    def add_error(report, number, errors):
+        report["failed"] += 1
+        report["errors"].append({"row": number, "errors": errors})
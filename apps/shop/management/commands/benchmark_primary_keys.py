@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from apps.common.utils import uuid7
+
+KEY_FUNCTIONS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+# The shape Django gives a BaseModel table on SQLite: a char(32) primary key with its own index
+CREATE_TABLE = (
+    'CREATE TABLE "bench" ("id" char(32) NOT NULL PRIMARY KEY, "created_at" datetime NOT NULL, '
+    '"payload" integer NOT NULL)'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares insert throughput and primary key index size of UUIDv4 and UUIDv7 keys "
+        "on a scratch SQLite table (the database does not need to exist)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--dir", help="Where the scratch databases go, a temporary directory by default.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(dir=options["dir"]) as directory:
+            results = [
+                self.run(os.path.join(directory, f"{name}.sqlite3"), make_key, options["rows"], options["batch_size"])
+                for name, make_key in KEY_FUNCTIONS.items()
+            ]
+        self.stdout.write(f"{'key':<6} {'rows/s':>10} {'last 10% rows/s':>16} {'index MB':>9} {'file MB':>8}")
+        for name, (rate, tail_rate, index_size, file_size) in zip(KEY_FUNCTIONS, results):
+            self.stdout.write(
+                f"{name:<6} {rate:>10,.0f} {tail_rate:>16,.0f} {index_size / 2**20:>9.1f} {file_size / 2**20:>8.1f}"
+            )
+
+    def run(self, path, make_key, rows, batch_size):
+        """
+        Inserts `rows` rows in batches of one transaction each. Keys are generated
+        outside the timed section so only the database work is measured.
+
+        Returns:
+            tuple: (rows/s, rows/s over the last 10% of rows, index bytes, file bytes).
+        """
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute(CREATE_TABLE)
+        created_at = "2026-01-01 00:00:00"
+        elapsed = tail_elapsed = 0.0
+        tail_start = rows - rows // 10
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            batch = [(make_key().hex, created_at, start + i) for i in range(count)]
+            began = time.perf_counter()
+            connection.execute("BEGIN")
+            connection.executemany('INSERT INTO "bench" VALUES (?, ?, ?)', batch)
+            connection.execute("COMMIT")
+            took = time.perf_counter() - began
+            elapsed += took
+            if start >= tail_start:
+                tail_elapsed += took
+            if start // batch_size % 100 == 99:
+                self.stderr.write(f"{os.path.basename(path)}: {start + count:,} rows")
+        index_size = connection.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_bench_1'"
+        ).fetchone()[0]
+        connection.close()
+        tail_rows = rows - tail_start
+        return rows / elapsed, tail_rows / tail_elapsed if tail_elapsed else 0.0, index_size, os.path.getsize(path)
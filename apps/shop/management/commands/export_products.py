@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.shop.exports import iter_export
+from apps.shop.fast_serializers import datetime_representation
+
+
+class Command(BaseCommand):
+    help = "Streams the live product catalog as NDJSON (or gzipped NDJSON) to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file, '-' for stdout.")
+        parser.add_argument("--updated-since", help="Only export products updated at or after this ISO 8601 date-time.")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options["updated_since"]:
+            updated_since = parse_datetime(options["updated_since"])
+            if updated_since is None:
+                raise CommandError(f"Invalid date-time {options['updated_since']!r}")
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+        started_at = timezone.now()
+        compression = "gzip" if options["gzip"] else None
+        chunks = iter_export(updated_since, compression)
+        if options["path"] == "-":
+            output = sys.stdout.buffer if compression else sys.stdout
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+        else:
+            with open(options["path"], "wb" if compression else "w", encoding=None if compression else "utf-8") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        # Next incremental export: --updated-since <this value>
+        self.stderr.write(f"Export started at {datetime_representation(started_at)}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.shop.carts import flush_dirty_carts
+
+
+class Command(BaseCommand):
+    help = "Saves every cart changed in the cache to the database, e.g. before a deploy."
+
+    def handle(self, *args, **options):
+        flushed = flush_dirty_carts()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} carts"))
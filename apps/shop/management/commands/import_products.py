@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sellers.models import Seller
+from apps.shop.importers import ProductImporter, import_format, iter_csv, iter_jsonl, text_stream
+
+
+class Command(BaseCommand):
+    help = "Bulk imports the products of a seller from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="A .csv or .jsonl file, one product per row.")
+        parser.add_argument("--seller", required=True, help="The slug of the approved seller owning the products.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        seller = Seller.objects.get_or_none(slug=options["seller"], is_approved=True)
+        if not seller:
+            raise CommandError(f"No approved seller with slug {options['seller']!r}")
+        file_format = import_format(options["path"])
+        if not file_format:
+            raise CommandError("Only .csv and .jsonl files are supported")
+        reader = iter_csv if file_format == "csv" else iter_jsonl
+        with open(options["path"], "rb") as file:
+            report = ProductImporter(seller, batch_size=options["batch_size"]).run(reader(text_stream(file)))
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} products, {report['failed']} rows failed"))
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.shop.purge import PURGE_TARGETS, purge_soft_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives and deletes rows soft deleted longer than the retention period, in batches. "
+        "Safe to interrupt and to run from cron: the next run resumes where this one stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days", type=int, default=None,
+            help=f"Age in days of the soft deletes to purge, {settings.SOFT_DELETE_RETENTION_DAYS} by default.",
+        )
+        parser.add_argument(
+            "--mode", choices=["archive", "delete"], default=None,
+            help="Copy the rows into ArchivedRow before deleting them or not, SOFT_DELETE_ARCHIVE by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction.")
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches.")
+        parser.add_argument("--time-limit", type=float, default=None, help="Stop after this many seconds.")
+        parser.add_argument(
+            "--model", action="append", dest="models",
+            choices=[target.model._meta.label for target in PURGE_TARGETS],
+            help="Only purge this model, may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        archive = None if options["mode"] is None else options["mode"] == "archive"
+        results = purge_soft_deleted(
+            retention_days=options["retention_days"], archive=archive, batch_size=options["batch_size"],
+            pause=options["pause"], time_limit=options["time_limit"], models=options["models"],
+        )
+        for stats in results:
+            line = (
+                f"{stats['model']}: purged {stats['purged']}, archived {stats['archived']} "
+                f"in {stats['seconds']}s ({stats['rate']} rows/s)"
+            )
+            if stats["finished"]:
+                self.stdout.write(self.style.SUCCESS(f"{line}, kept {stats['kept']} still referenced"))
+            else:
+                self.stdout.write(self.style.WARNING(f"{line}, stopped by the time limit"))
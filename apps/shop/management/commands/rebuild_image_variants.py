@@ -0,0 +1,59 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import User
+from apps.common.images import ensure_variants
+from apps.shop.models import Category, Product
+
+# (model, image fields) whose files get thumbnails and WebP variants
+IMAGE_FIELDS = [
+    (Product, ("image1", "image2", "image3")),
+    (Category, ("image",)),
+    (User, ("avatar",)),
+]
+
+
+class Command(BaseCommand):
+    help = "Renders the missing thumbnails and WebP variants of every uploaded image, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.IMAGE_WORKERS)
+        parser.add_argument("--force", action="store_true", help="Render the variants that already exist too.")
+
+    def iter_images(self):
+        seen = set()
+        for model, field_names in IMAGE_FIELDS:
+            manager = getattr(model.objects, "unfiltered", model.objects.all)()
+            for field_name in field_names:
+                storage = model._meta.get_field(field_name).storage
+                names = manager.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                for name in names.values_list(field_name, flat=True).distinct().iterator():
+                    if (storage, name) not in seen:
+                        seen.add((storage, name))
+                        yield storage, name
+
+    def handle(self, *args, **options):
+        rendered = failed = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for storage, name in self.iter_images():
+                # Keep the queue short, there may be millions of images
+                if len(pending) >= options["workers"] * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    rendered, failed = self.collect(done, rendered, failed)
+                future = pool.submit(ensure_variants, storage, name, force=options["force"])
+                future.image_name = name
+                pending.add(future)
+            rendered, failed = self.collect(wait(pending).done, rendered, failed)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} image variants, {failed} images failed"))
+
+    def collect(self, futures, rendered, failed):
+        for future in futures:
+            try:
+                rendered += len(future.result())
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"{future.image_name}: {exc}")
+        return rendered, failed
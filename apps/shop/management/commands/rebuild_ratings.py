@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the denormalized rating aggregates of every product from its live reviews."
+
+    def handle(self, *args, **options):
+        updated = Product.refresh_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {updated} products"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.profiles.models import SalesRollup
+from apps.sellers.models import Seller
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the seller sales rollups from the placed orders, e.g. to backfill them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seller", help="The slug of a seller to rebuild, every seller by default.")
+
+    def handle(self, *args, **options):
+        seller = None
+        if options["seller"]:
+            seller = Seller.objects.get_or_none(slug=options["seller"])
+            if not seller:
+                raise CommandError(f"No seller with slug {options['seller']!r}")
+        written = SalesRollup.rebuild(seller)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} sales rollup rows"))
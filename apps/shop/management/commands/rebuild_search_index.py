@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.shop.search import fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text product search index from the live products."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("Full-text index is only maintained on SQLite, nothing to do"))
+            return
+        indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products"))
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# The FTS5 index shares rowids with shop_product and only holds live products,
+# the triggers keep it in sync on insert, update, soft delete and hard delete.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        name, "desc", tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product
+    WHEN new.is_deleted = 0
+    BEGIN
+        INSERT INTO shop_product_fts(rowid, name, "desc") VALUES (new.rowid, new.name, new."desc");
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, "desc", is_deleted ON shop_product
+    WHEN old.name IS NOT new.name OR old."desc" IS NOT new."desc" OR old.is_deleted IS NOT new.is_deleted
+    BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.rowid;
+        INSERT INTO shop_product_fts(rowid, name, "desc")
+            SELECT new.rowid, new.name, new."desc" WHERE new.is_deleted = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product
+    BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    INSERT INTO shop_product_fts(rowid, name, "desc")
+        SELECT rowid, name, "desc" FROM shop_product WHERE is_deleted = 0
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+    "DROP TABLE IF EXISTS shop_product_fts",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:32
+
+import apps.common.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_partial_catalog_indexes'),
+    ]
+
+    # Same column, only the Python field class changes: skip the SQLite table rebuild
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='product',
+                    name='slug',
+                    field=apps.common.fields.PresetAutoSlugField(editable=False, populate_from='name', unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0001_initial'),
+        ('shop', '0010_product_slug_preset'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['updated_at', 'id'], name='product_live_updated'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:12
+
+import apps.common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_product_live_updated_index'),
+    ]
+
+    # Only the Python default changes: skip the SQLite table rebuild
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='category',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='review',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.default_id, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:40
+
+from django.db import migrations
+
+# The index was keyed on the implicit rowid of shop_product, which VACUUM may renumber.
+# It is now keyed on shop_product_fts_doc.docid, an INTEGER PRIMARY KEY per product id.
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+]
+
+CREATE_SQL = DROP_TRIGGERS_SQL + [
+    """
+    CREATE TABLE shop_product_fts_doc (
+        docid INTEGER PRIMARY KEY,
+        product_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product
+    WHEN new.is_deleted = 0
+    BEGIN
+        INSERT OR IGNORE INTO shop_product_fts_doc(product_id) VALUES (new.id);
+        INSERT INTO shop_product_fts(rowid, name, "desc")
+            SELECT docid, new.name, new."desc" FROM shop_product_fts_doc WHERE product_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, "desc", is_deleted ON shop_product
+    WHEN old.name IS NOT new.name OR old."desc" IS NOT new."desc" OR old.is_deleted IS NOT new.is_deleted
+    BEGIN
+        DELETE FROM shop_product_fts
+            WHERE rowid = (SELECT docid FROM shop_product_fts_doc WHERE product_id = old.id);
+        INSERT OR IGNORE INTO shop_product_fts_doc(product_id) SELECT new.id WHERE new.is_deleted = 0;
+        INSERT INTO shop_product_fts(rowid, name, "desc")
+            SELECT docid, new.name, new."desc" FROM shop_product_fts_doc
+            WHERE product_id = new.id AND new.is_deleted = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product
+    BEGIN
+        DELETE FROM shop_product_fts
+            WHERE rowid = (SELECT docid FROM shop_product_fts_doc WHERE product_id = old.id);
+        DELETE FROM shop_product_fts_doc WHERE product_id = old.id;
+    END
+    """,
+    "DELETE FROM shop_product_fts",
+    "INSERT INTO shop_product_fts_doc(product_id) SELECT id FROM shop_product WHERE is_deleted = 0",
+    """
+    INSERT INTO shop_product_fts(rowid, name, "desc")
+        SELECT shop_product_fts_doc.docid, shop_product.name, shop_product."desc" FROM shop_product
+        JOIN shop_product_fts_doc ON shop_product_fts_doc.product_id = shop_product.id
+    """,
+]
+
+# Back to the rowid keyed index of 0008
+REVERSE_SQL = DROP_TRIGGERS_SQL + [
+    "DROP TABLE IF EXISTS shop_product_fts_doc",
+    """
+    CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product
+    WHEN new.is_deleted = 0
+    BEGIN
+        INSERT INTO shop_product_fts(rowid, name, "desc") VALUES (new.rowid, new.name, new."desc");
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, "desc", is_deleted ON shop_product
+    WHEN old.name IS NOT new.name OR old."desc" IS NOT new."desc" OR old.is_deleted IS NOT new.is_deleted
+    BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.rowid;
+        INSERT INTO shop_product_fts(rowid, name, "desc")
+            SELECT new.rowid, new.name, new."desc" WHERE new.is_deleted = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product
+    BEGIN
+        DELETE FROM shop_product_fts WHERE rowid = old.rowid;
+    END
+    """,
+    "DELETE FROM shop_product_fts",
+    """
+    INSERT INTO shop_product_fts(rowid, name, "desc")
+        SELECT rowid, name, "desc" FROM shop_product WHERE is_deleted = 0
+    """,
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_soft_deleted_purge'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(REVERSE_SQL)),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_product_search_doc_ids'),
+    ]
+
+    # A TextField max_length only reaches forms and serializers: skip the SQLite table rebuild
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='review',
+                    name='text',
+                    field=models.TextField(max_length=1100),
+                ),
+            ],
+        ),
+    ]
@@ -1,9 +1,13 @@
 from autoslug import AutoSlugField
 from django.db import models
+from django.utils import timezone
 from apps.sellers.models import Seller
 from apps.common.models import BaseModel, IsDeletedModel
+from apps.common.fields import PresetAutoSlugField
+from apps.common.managers import IsDeletedManager, IsDeletedQuerySet
 from apps.accounts.models import User
-from django.db.models import Q
+from django.db.models import F, Q, Avg, Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
 
 class Category(BaseModel):
     """
@@ -46,11 +50,14 @@ class Product(IsDeletedModel):
         image1 (ImageField): The first image of the product.
         image2 (ImageField): The second image of the product.
         image3 (ImageField): The third image of the product.
+        rating_sum (int): The sum of ratings of all live reviews.
+        rating_count (int): The number of live reviews.
+        average_rating (Decimal): The average rating, kept in sync with the reviews.
     """
 
     seller = models.ForeignKey(Seller, on_delete=models.SET_NULL, related_name="products", null=True)
     name = models.CharField(max_length=100)
-    slug = AutoSlugField(populate_from="name", db_index=True, unique=True)
+    slug = PresetAutoSlugField(populate_from="name", db_index=True, unique=True)
     desc = models.TextField()
     price_old = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     price_current = models.DecimalField(max_digits=10, decimal_places=2)
@@ -62,9 +69,125 @@ class Product(IsDeletedModel):
     image2 = models.ImageField(upload_to='product_images/', blank=True)
     image3 = models.ImageField(upload_to='product_images/', blank=True)
 
+    # Denormalized rating aggregates, maintained by Review.save()
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, db_index=True)
+
     def __str__(self):
         return str(self.name)
 
+    class Meta(IsDeletedModel.Meta):
+        # Partial indexes: every IsDeletedManager query filters on is_deleted = false
+        indexes = [
+            models.Index(fields=["category", "price_current"], condition=Q(is_deleted=False),
+                         name="product_live_category_price"),
+            models.Index(fields=["seller", "created_at"], condition=Q(is_deleted=False),
+                         name="product_live_seller_created"),
+            models.Index(fields=["price_current", "id"], condition=Q(is_deleted=False),
+                         name="product_live_price"),
+            models.Index(fields=["created_at", "id"], condition=Q(is_deleted=False),
+                         name="product_live_created"),
+            models.Index(fields=["in_stock"], condition=Q(is_deleted=False),
+                         name="product_live_in_stock"),
+            models.Index(fields=["updated_at", "id"], condition=Q(is_deleted=False),
+                         name="product_live_updated"),
+            # Purge scan of soft-deleted rows, see apps.shop.purge
+            models.Index(fields=["deleted_at", "id"], condition=Q(is_deleted=True), name="product_deleted"),
+        ]
+
+    @classmethod
+    def reserve_stock(cls, quantities):
+        """
+        Takes the given quantities out of stock, one conditional UPDATE per product.
+
+        The decrement only applies while in_stock covers the quantity, so concurrent
+        checkouts can never oversell. Products are updated in a fixed order to avoid
+        lock-order deadlocks. Run it in a transaction and roll back when something is short.
+
+        Args:
+            quantities (dict): {product id: quantity}.
+
+        Returns:
+            list: The ids of the products without enough stock, empty on success.
+        """
+        short = []
+        # updated_at moves with the stock, so ETags and the export feed see the change
+        now = timezone.now()
+        for product_id, quantity in sorted(quantities.items()):
+            reserved = cls.objects.filter(pk=product_id, in_stock__gte=quantity).update(
+                in_stock=F("in_stock") - quantity, updated_at=now
+            )
+            if not reserved:
+                short.append(product_id)
+        return short
+
+    @classmethod
+    def release_stock(cls, quantities):
+        """Puts back quantities taken by reserve_stock ({product id: quantity})."""
+        now = timezone.now()
+        for product_id, quantity in sorted(quantities.items()):
+            cls.objects.unfiltered().filter(pk=product_id).update(in_stock=F("in_stock") + quantity, updated_at=now)
+
+    @staticmethod
+    def rating_aggregates():
+        """
+        Returns the expressions that recompute the rating columns from live reviews
+        of the product referenced by OuterRef('pk').
+        """
+        reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+        return {
+            "rating_sum": Coalesce(Subquery(reviews.annotate(s=Sum("rating")).values("s")), Value(0)),
+            "rating_count": Coalesce(Subquery(reviews.annotate(c=Count("pk")).values("c")), Value(0)),
+            "average_rating": Coalesce(
+                Subquery(reviews.annotate(a=Round(Avg("rating"), 2)).values("a")),
+                Value(0),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        }
+
+    @classmethod
+    def refresh_ratings(cls, queryset=None, touch=False):
+        """
+        Recomputes the rating columns with a single UPDATE statement.
+
+        With touch=True updated_at is bumped as well, so that ETag/Last-Modified
+        of the product change together with its rating.
+        """
+        if queryset is None:
+            queryset = cls.objects.unfiltered()
+        fields = cls.rating_aggregates()
+        if touch:
+            fields["updated_at"] = timezone.now()
+        return queryset.update(**fields)
+
+
+class ReviewQuerySet(IsDeletedQuerySet):
+    """Keeps the product rating columns in sync on bulk writes, as Review.save does for one review."""
+
+    def rated_products(self):
+        product_ids = list(self.order_by().values_list("product_id", flat=True).distinct())
+        return Product.objects.unfiltered().filter(pk__in=product_ids)
+
+    def update(self, **kwargs):
+        # Soft deletes end up here too. Ids are read first: the update may take the rows out of the queryset
+        products = self.rated_products()
+        rows = super().update(**kwargs)
+        Product.refresh_ratings(products, touch=True)
+        return rows
+
+    def delete(self, hard_delete=False):
+        if not hard_delete:
+            return super().delete()
+        products = self.rated_products()
+        deleted = super().delete(hard_delete=True)
+        Product.refresh_ratings(products, touch=True)
+        return deleted
+
+
+class ReviewManager(IsDeletedManager):
+    queryset_class = ReviewQuerySet
+
 
 class Review(IsDeletedModel):
     """
@@ -78,5 +201,22 @@ class Review(IsDeletedModel):
     rating = models.IntegerField(choices=RATING_CHOICES)
     text = models.TextField(max_length=1100)
 
-
-
+    objects = ReviewManager()
+
+    class Meta(IsDeletedModel.Meta):
+        indexes = [
+            models.Index(fields=["product", "created_at"], condition=Q(is_deleted=False),
+                         name="review_live_product_created"),
+            models.Index(fields=["product", "rating"], condition=Q(is_deleted=False),
+                         name="review_live_product_rating"),
+            models.Index(fields=["deleted_at", "id"], condition=Q(is_deleted=True), name="review_deleted"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Covers create, update and soft delete (IsDeletedModel.delete saves too)
+        super().save(*args, **kwargs)
+        Product.refresh_ratings(Product.objects.unfiltered().filter(pk=self.product_id), touch=True)
+
+    def hard_delete(self, *args, **kwargs):
+        super().hard_delete(*args, **kwargs)
+        Product.refresh_ratings(Product.objects.unfiltered().filter(pk=self.product_id), touch=True)
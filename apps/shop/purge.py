@@ -0,0 +1,208 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.common.cache import invalidate_model
+from apps.common.models import ArchivedRow
+from apps.profiles.models import Order, OrderItem, SellerOrder, ShippingAddress
+from apps.sellers.models import Seller
+from apps.shop.carts import CART_KEY, CartStore, cart_cache
+from apps.shop.models import Product, Review
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeTarget:
+    """
+    A soft-deleted model purged by purge_soft_deleted.
+
+    Subclasses name the rows that must stay (kept) and the rows the delete
+    cascades to that are worth archiving with the purged ones (cascades).
+    """
+
+    model = None
+    # (model, lookup pointing at the purged model), rows archived together with the purged ones
+    cascades = ()
+
+    def kept(self):
+        """A condition on rows that cannot be purged, None when every row can."""
+        return None
+
+    def expired(self, cutoff):
+        # Served by the partial (deleted_at, id) index on is_deleted = true
+        return self.model._base_manager.filter(is_deleted=True, deleted_at__lt=cutoff)
+
+    def candidates(self, cutoff):
+        queryset = self.expired(cutoff)
+        kept = self.kept()
+        if kept is not None:
+            queryset = queryset.exclude(kept)
+        return queryset.order_by("deleted_at", "pk")
+
+    def count_kept(self, cutoff):
+        kept = self.kept()
+        return 0 if kept is None else self.expired(cutoff).filter(kept).count()
+
+    def before_delete(self, ids):
+        pass
+
+    def after_delete(self, ids):
+        pass
+
+
+class ReviewTarget(PurgeTarget):
+    # Ratings only count live reviews, purging deleted ones does not change them
+    model = Review
+
+
+class ProductTarget(PurgeTarget):
+    model = Product
+    cascades = ((Review, "product"),)
+
+    def kept(self):
+        # Ordered products stay for the order history, cart rows go with the product
+        return Exists(OrderItem.objects.filter(product=OuterRef("pk"), order__isnull=False))
+
+    def before_delete(self, ids):
+        carts = OrderItem.objects.filter(product__in=ids, order=None).values_list("user_id", flat=True).distinct()
+        for user_id in carts:
+            CartStore(user_id).discard(ids)
+
+
+class UserTarget(PurgeTarget):
+    model = User
+    # Products keep their row with seller=None (SET_NULL), the archive keeps the link
+    cascades = (
+        (Review, "user"), (Seller, "user"), (ShippingAddress, "user"), (Product, "seller__user"),
+    )
+
+    def kept(self):
+        # Buyers and sellers of placed orders stay, the orders reference them. So do
+        # sellers with products for sale, which would be left on sale without a seller
+        return (
+            Exists(Order.objects.filter(user=OuterRef("pk")))
+            | Exists(SellerOrder.objects.filter(seller__user=OuterRef("pk")))
+            | Exists(Product.objects.filter(seller__user=OuterRef("pk")))
+        )
+
+    def before_delete(self, ids):
+        # Live reviews of a deleted user still count in the product ratings
+        self.rated = list(
+            Review.objects.filter(user__in=ids).order_by().values_list("product_id", flat=True).distinct()
+        )
+        self.orphaned = Product.objects.unfiltered().filter(seller__user__in=ids).exists()
+
+    def after_delete(self, ids):
+        if self.rated:
+            Product.refresh_ratings(Product.objects.unfiltered().filter(pk__in=self.rated), touch=True)
+        if self.orphaned:
+            # The cascade sets seller=None with a plain UPDATE, which skips post_save
+            invalidate_model(Product)
+        cart_cache.delete_many([CART_KEY.format(user_id) for user_id in ids])
+
+
+# Reviews first: the product and user batches then cascade to fewer rows
+PURGE_TARGETS = (ReviewTarget, ProductTarget, UserTarget)
+
+
+def archive_rows(model, queryset):
+    """
+    Copies rows into ArchivedRow. Rows archived by an interrupted earlier run are skipped.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    label = model._meta.label
+    rows = [
+        ArchivedRow(model=label, object_id=values["id"], deleted_at=values.get("deleted_at"), data=values)
+        for values in queryset.values()
+    ]
+    ArchivedRow.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def purge_batch(target, cutoff, batch_size, archive):
+    """
+    Archives (optionally) and deletes the oldest `batch_size` expired rows of a target
+    in one short transaction.
+
+    Returns:
+        tuple: (rows purged, rows archived).
+    """
+    model = target.model
+    with transaction.atomic():
+        # Rows locked by a concurrent write are left to the next batch
+        ids = list(
+            target.candidates(cutoff).select_for_update(skip_locked=True).values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+        rows = model._base_manager.filter(pk__in=ids)
+        archived = 0
+        if archive:
+            archived += archive_rows(model, rows)
+            for related, field in target.cascades:
+                archived += archive_rows(related, related._base_manager.filter(**{f"{field}__in": ids}))
+        target.before_delete(ids)
+        rows.delete()
+        target.after_delete(ids)
+    return len(ids), archived
+
+
+def purge_soft_deleted(retention_days=None, archive=None, batch_size=500, pause=0, time_limit=None, models=None):
+    """
+    Removes the reviews, products and users soft deleted more than `retention_days` ago.
+
+    Rows go in batches of `batch_size`, oldest first, each batch in its own transaction,
+    so locks are short and an interrupted run resumes where it stopped when started again.
+    Products still referenced by placed orders, users with orders and sellers with
+    products for sale are kept. Callable from the purge_deleted command or any scheduler.
+
+    Args:
+        retention_days (int): SOFT_DELETE_RETENTION_DAYS by default.
+        archive (bool): Copy the rows into ArchivedRow before deleting them, SOFT_DELETE_ARCHIVE by default.
+        batch_size (int): Rows per transaction.
+        pause (float): Seconds to sleep between batches, to leave room for other writes.
+        time_limit (float): Stop after this many seconds, a later run picks up the rest.
+        models (iterable): Labels of the models to purge (e.g. "shop.Product"), all of them by default.
+
+    Returns:
+        list: One dict per model: model, purged, archived, kept, seconds, rate (rows per second)
+            and finished (False when the time limit stopped the run).
+    """
+    if retention_days is None:
+        retention_days = settings.SOFT_DELETE_RETENTION_DAYS
+    if archive is None:
+        archive = settings.SOFT_DELETE_ARCHIVE
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    results = []
+    for target_class in PURGE_TARGETS:
+        target = target_class()
+        label = target.model._meta.label
+        if models is not None and label not in models:
+            continue
+        stats = {"model": label, "purged": 0, "archived": 0, "kept": 0, "finished": False}
+        started = time.monotonic()
+        while deadline is None or time.monotonic() < deadline:
+            purged, archived = purge_batch(target, cutoff, batch_size, archive)
+            stats["purged"] += purged
+            stats["archived"] += archived
+            if purged < batch_size:
+                stats["finished"] = True
+                break
+            if pause:
+                time.sleep(pause)
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        stats["rate"] = round(stats["purged"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        if stats["finished"]:
+            stats["kept"] = target.count_kept(cutoff)
+        logger.info("Purged %(purged)s %(model)s rows in %(seconds)ss (%(rate)s rows/s)", stats)
+        results.append(stats)
+    return results
@@ -1,7 +1,28 @@
 from drf_spectacular.utils import OpenApiParameter, OpenApiTypes
 from core import settings
 
-PRODUCT_PARAM_EXAMPLE = [
+SPARSE_FIELDS_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name="fields",
+        description="Comma-separated list of fields to return. Defaults to all fields, unknown names are rejected with a 400",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name="expand",
+        description="Comma-separated nested objects to render in full when fields is set, otherwise they collapse to a slug. Unknown names are rejected with a 400",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
+
+PRODUCT_PARAM_EXAMPLE = SPARSE_FIELDS_PARAM_EXAMPLE + [
+    OpenApiParameter(
+        name="q",
+        description="Full-text search in product name and description",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
     OpenApiParameter(
         name="max_price",
         description="Filter products by MAX current price",
@@ -26,6 +47,12 @@ PRODUCT_PARAM_EXAMPLE = [
         required=False,
         type=OpenApiTypes.DATE,
     ),
+    OpenApiParameter(
+        name="ordering",
+        description="Order products by rating, price or created_at (prefix with '-' for descending)",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
     OpenApiParameter(
         name="page",
         description="Retrieve a particular page. Defaults to 1",
@@ -38,9 +65,88 @@ PRODUCT_PARAM_EXAMPLE = [
         required=False,
         type=OpenApiTypes.INT,
     ),
+    OpenApiParameter(
+        name="pagination",
+        description="Set to 'cursor' to use keyset pagination (ordering: created_at or price, '-' for descending, "
+                    "other orderings are rejected)",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name="cursor",
+        description="Opaque cursor returned in the next/previous links of a cursor page",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
+
+ORDER_LIST_PARAM_EXAMPLE = SPARSE_FIELDS_PARAM_EXAMPLE[:1] + [
+    OpenApiParameter(
+        name="page_size",
+        description=f"The amount of orders per page. Defaults to {settings.REST_FRAMEWORK['PAGE_SIZE']}",
+        required=False,
+        type=OpenApiTypes.INT,
+    ),
+    OpenApiParameter(
+        name="ordering",
+        description="created_at or -created_at (newest first, the default)",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name="cursor",
+        description="Opaque cursor returned in the next/previous links of a page",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
 ]
 
-REVIEW_PARAM_EXAMPLE = [
+SALES_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name="start",
+        description="First day of the range (YYYY-MM-DD). Defaults to 29 days before end",
+        required=False,
+        type=OpenApiTypes.DATE,
+    ),
+    OpenApiParameter(
+        name="end",
+        description="Last day of the range (YYYY-MM-DD). Defaults to today",
+        required=False,
+        type=OpenApiTypes.DATE,
+    ),
+]
+
+PRODUCT_FACETS_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name="bucket_size",
+        description="The width of a price bucket. Defaults to 100",
+        required=False,
+        type=OpenApiTypes.INT,
+    ),
+]
+
+PRODUCT_LIST_PARAM_EXAMPLE = SPARSE_FIELDS_PARAM_EXAMPLE + [
+    OpenApiParameter(
+        name="page",
+        description="Retrieve a particular page. Defaults to 1",
+        required=False,
+        type=OpenApiTypes.INT,
+    ),
+    OpenApiParameter(
+        name="page_size",
+        description=f"The amount of item per page you want to display. Defaults to {settings.REST_FRAMEWORK['PAGE_SIZE']}",
+        required=False,
+        type=OpenApiTypes.INT,
+    ),
+    OpenApiParameter(
+        name="stream",
+        description="Set to 'ndjson' to stream all products as newline-delimited JSON instead of a page",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
+
+REVIEW_PARAM_EXAMPLE = SPARSE_FIELDS_PARAM_EXAMPLE + [
     OpenApiParameter(
         name="min_rating",
         description="Filter review by MIN rating",
@@ -82,3 +188,29 @@ REVIEW_PARAM_EXAMPLE = [
         type=OpenApiTypes.INT,
     ),
 ]
+
+PRODUCT_EXPORT_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name="updated_since",
+        description="Only export products updated at or after this date-time, e.g. the X-Export-Started-At of the previous export",
+        required=False,
+        type=OpenApiTypes.DATETIME,
+    ),
+    OpenApiParameter(
+        name="compression",
+        description="Pass gzip to download a gzipped NDJSON file",
+        required=False,
+        type=OpenApiTypes.STR,
+        enum=["gzip"],
+    ),
+]
+
+IDEMPOTENCY_KEY_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name="Idempotency-Key",
+        location=OpenApiParameter.HEADER,
+        description="Unique key of this request; a retry with the same key replays the first response instead of running again",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "shop_product_fts"
+# Gives every product a stable integer key, the FTS5 rowid. An INTEGER PRIMARY KEY
+# survives VACUUM, unlike the implicit rowid of shop_product (a UUID primary key)
+DOC_TABLE = "shop_product_fts_doc"
+
+# Only letters and digits reach the MATCH expression, so user input can never
+# produce an FTS5 syntax error.
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == "sqlite"
+
+
+def build_match_query(query):
+    """
+    Turns free text into an FTS5 query where every term must match as a prefix.
+
+    Args:
+        query (str): The raw ?q= value.
+
+    Returns:
+        str: The MATCH expression, or an empty string when there is nothing to search for.
+    """
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def search_products(queryset, query):
+    """
+    Restricts a Product queryset to rows matching `query` in name or desc.
+
+    On SQLite the matches come from the FTS5 index and every row is annotated
+    with its BM25 `search_rank` (lower is better, name weighted above desc).
+    Other backends fall back to icontains lookups.
+    """
+    match = build_match_query(query)
+    if not match:
+        return queryset.none()
+    if not fts_available():
+        condition = Q()
+        for token in TOKEN_RE.findall(query):
+            condition &= Q(name__icontains=token) | Q(desc__icontains=token)
+        return queryset.filter(condition)
+    matches = RawSQL(
+        f"SELECT {DOC_TABLE}.product_id FROM {FTS_TABLE} "
+        f"JOIN {DOC_TABLE} ON {DOC_TABLE}.docid = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s",
+        [match],
+    )
+    # Only computed for the matching rows, each one a rowid lookup in the index
+    rank = RawSQL(
+        f"SELECT bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "
+        f"(SELECT docid FROM {DOC_TABLE} WHERE {DOC_TABLE}.product_id = shop_product.id)",
+        [match],
+        output_field=FloatField(),
+    )
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+TRIGGERS_SQL = {
+    "shop_product_fts_ai": """
+        CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product
+        WHEN new.is_deleted = 0
+        BEGIN
+            INSERT OR IGNORE INTO shop_product_fts_doc(product_id) VALUES (new.id);
+            INSERT INTO shop_product_fts(rowid, name, "desc")
+                SELECT docid, new.name, new."desc" FROM shop_product_fts_doc WHERE product_id = new.id;
+        END
+    """,
+    "shop_product_fts_au": """
+        CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, "desc", is_deleted ON shop_product
+        WHEN old.name IS NOT new.name OR old."desc" IS NOT new."desc" OR old.is_deleted IS NOT new.is_deleted
+        BEGIN
+            DELETE FROM shop_product_fts
+                WHERE rowid = (SELECT docid FROM shop_product_fts_doc WHERE product_id = old.id);
+            INSERT OR IGNORE INTO shop_product_fts_doc(product_id) SELECT new.id WHERE new.is_deleted = 0;
+            INSERT INTO shop_product_fts(rowid, name, "desc")
+                SELECT docid, new.name, new."desc" FROM shop_product_fts_doc
+                WHERE product_id = new.id AND new.is_deleted = 0;
+        END
+    """,
+    "shop_product_fts_ad": """
+        CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product
+        BEGIN
+            DELETE FROM shop_product_fts
+                WHERE rowid = (SELECT docid FROM shop_product_fts_doc WHERE product_id = old.id);
+            DELETE FROM shop_product_fts_doc WHERE product_id = old.id;
+        END
+    """,
+}
+
+
+def ensure_search_index(using="default", **kwargs):
+    """
+    Recreates the sync triggers and rebuilds the index when they are missing.
+
+    Connected to post_migrate: SQLite migrations that alter shop_product rebuild
+    the table, which drops its triggers.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s, %s, %s, %s, %s)",
+            [FTS_TABLE, DOC_TABLE, *TRIGGERS_SQL],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if DOC_TABLE not in existing or existing.issuperset(TRIGGERS_SQL):
+            # Not migrated yet, or nothing to repair
+            return
+        for name, sql in TRIGGERS_SQL.items():
+            if name not in existing:
+                cursor.execute(sql)
+    rebuild_search_index(using)
+
+
+def rebuild_search_index(using="default"):
+    """
+    Repopulates the FTS5 index from the live products.
+
+    Returns:
+        int: The number of indexed products.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return 0
+    with db.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"DELETE FROM {DOC_TABLE} WHERE product_id NOT IN (SELECT id FROM shop_product)")
+        cursor.execute(f"INSERT OR IGNORE INTO {DOC_TABLE}(product_id) SELECT id FROM shop_product WHERE is_deleted = 0")
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, "desc") '
+            f'SELECT {DOC_TABLE}.docid, shop_product.name, shop_product."desc" FROM shop_product '
+            f'JOIN {DOC_TABLE} ON {DOC_TABLE}.product_id = shop_product.id WHERE shop_product.is_deleted = 0'
+        )
+        indexed = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+    return indexed
@@ -1,9 +1,12 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from apps.sellers.serializers import SellerSerializer
 from drf_spectacular.utils import extend_schema_field
 from apps.profiles.serializers import ShippingAddressSerializer, ProfileSerializer
+from apps.common.serializers import ImageVariantsField, SparseFieldsMixin
 from .models import Product
-from django.db.models import Avg
 
 
 def one_to_five_rating(value):
@@ -15,6 +18,7 @@ class CategorySerializer(serializers.Serializer):
     name = serializers.CharField()
     slug = serializers.SlugField(read_only=True)
     image = serializers.ImageField()
+    image_variants = ImageVariantsField(source="image")
 
 
 class SellerShopSerializer(serializers.Serializer):
@@ -35,11 +39,54 @@ class ProductSerializer(serializers.Serializer):
     image1 = serializers.ImageField()
     image2 = serializers.ImageField(required=False)
     image3 = serializers.ImageField(required=False)
-    average_rating = serializers.SerializerMethodField()
+    image1_variants = ImageVariantsField(source="image1")
+    image2_variants = ImageVariantsField(source="image2")
+    image3_variants = ImageVariantsField(source="image3")
+    average_rating = serializers.FloatField()
+
+
+class ExportProductSerializer(ProductSerializer):
+    id = serializers.UUIDField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+
+    def get_fields(self):
+        # id first, timestamps last, like ProductExportSerializer rows
+        fields = super().get_fields()
+        return {"id": fields.pop("id"), **fields}
+
+
+class ProductFacetsParamsSerializer(serializers.Serializer):
+    bucket_size = serializers.IntegerField(min_value=1, default=100)
+
+
+class CategoryFacetSerializer(serializers.Serializer):
+    slug = serializers.CharField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class PriceFacetSerializer(serializers.Serializer):
+    min = serializers.IntegerField()
+    max = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class StockFacetSerializer(serializers.Serializer):
+    in_stock = serializers.IntegerField()
+    out_of_stock = serializers.IntegerField()
+
+
+class ProductFacetsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    categories = CategoryFacetSerializer(many=True)
+    price = PriceFacetSerializer(many=True)
+    in_stock = StockFacetSerializer()
+
 
-    def get_average_rating(self, obj):
-        avg = obj.review.aggregate(average_rating=Avg('rating'))['average_rating']
-        return round(avg, 2) if avg else 0.0
+class ProductExportParamsSerializer(serializers.Serializer):
+    updated_since = serializers.DateTimeField(required=False)
+    compression = serializers.ChoiceField(choices=["gzip"], required=False)
 
 
 class CreateProductSerializer(serializers.Serializer):
@@ -53,6 +100,104 @@ class CreateProductSerializer(serializers.Serializer):
     image3 = serializers.ImageField(required=False)
 
 
+class ImportProductSerializer(serializers.Serializer):
+    """
+    One row of a bulk product import. Images are paths of files already in storage.
+    The `categories` context entry maps category slugs to ids.
+    """
+    name = serializers.CharField(max_length=100)
+    desc = serializers.CharField()
+    price_current = serializers.DecimalField(max_digits=10, decimal_places=2)
+    category_slug = serializers.CharField()
+    in_stock = serializers.IntegerField(required=False, default=5)
+    image1 = serializers.CharField(max_length=100)
+    image2 = serializers.CharField(max_length=100, required=False, allow_blank=True, default="")
+    image3 = serializers.CharField(max_length=100, required=False, allow_blank=True, default="")
+
+    def validate_category_slug(self, value):
+        if value not in self.context["categories"]:
+            raise serializers.ValidationError("Category does not exist!")
+        return value
+
+
+class ImportProductsSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+
+class ImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    errors = serializers.DictField()
+
+
+class ImportProductsResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    errors = ImportErrorSerializer(many=True)
+
+
+class BulkUpdateProductSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    price_current = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    in_stock = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if "price_current" not in attrs and "in_stock" not in attrs:
+            raise serializers.ValidationError("Set price_current, in_stock or both")
+        return attrs
+
+
+class BulkUpdateProductResultSerializer(serializers.Serializer):
+    updated = serializers.IntegerField()
+
+
+class SalesParamsSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    # Longest range answered in one response, in days
+    max_days = 366 * 5
+
+    def validate(self, attrs):
+        end = attrs.setdefault("end", timezone.localdate())
+        start = attrs.setdefault("start", end - timedelta(days=29))
+        if start > end:
+            raise serializers.ValidationError("start must not be after end")
+        if (end - start).days >= self.max_days:
+            raise serializers.ValidationError(f"The range must be shorter than {self.max_days} days")
+        return attrs
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SalesDaySerializer(SalesTotalsSerializer):
+    day = serializers.DateField()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        return {"day": fields.pop("day"), **fields}
+
+
+class SalesProductSerializer(SalesTotalsSerializer):
+    slug = serializers.SlugField()
+    name = serializers.CharField()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        return {"slug": fields.pop("slug"), "name": fields.pop("name"), **fields}
+
+
+class SalesReportSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    totals = SalesTotalsSerializer()
+    days = SalesDaySerializer(many=True)
+    products = SalesProductSerializer(many=True)
+
+
 class OrderItemProductSerializer(serializers.Serializer):
     seller = SellerSerializer()
     name = serializers.CharField()
@@ -77,7 +222,7 @@ class CheckoutSerializer(serializers.Serializer):
     shipping_id = serializers.UUIDField()
 
 
-class OrderSerializer(serializers.Serializer):
+class OrderSerializer(SparseFieldsMixin, serializers.Serializer):
     tx_ref = serializers.CharField()
     first_name = serializers.CharField(source="user.first_name")
     last_name = serializers.CharField(source="user.last_name")
@@ -86,17 +231,87 @@ class OrderSerializer(serializers.Serializer):
     payment_status = serializers.CharField()
     date_delivered = serializers.DateTimeField()
     shipping_details = serializers.SerializerMethodField()
-    subtotal = serializers.DecimalField(
-        max_digits=100, decimal_places=2, source="get_cart_subtotal"
-    )
-    total = serializers.DecimalField(
-        max_digits=100, decimal_places=2, source="get_cart_total"
-    )
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
 
     @extend_schema_field(ShippingAddressSerializer)
     def get_shipping_details(self, obj):
         return ShippingAddressSerializer(obj).data
 
+    # Columns each field reads
+    field_columns = {
+        "tx_ref": ("tx_ref",),
+        "first_name": ("user__first_name",),
+        "last_name": ("user__last_name",),
+        "email": ("user__email",),
+        "delivery_status": ("delivery_status",),
+        "payment_status": ("payment_status",),
+        "date_delivered": ("date_delivered",),
+        "shipping_details": ("full_name", "email", "phone", "address", "city", "country", "zipcode"),
+        "subtotal": ("subtotal",),
+        "total": ("total",),
+    }
+
+    @classmethod
+    def prepare(cls, queryset, fields=None):
+        """Fetches only the columns and joins the requested fields read."""
+        if fields is None:
+            return queryset.select_related("user")
+        columns = {column for name in fields & cls.field_columns.keys() for column in cls.field_columns[name]}
+        if any(column.startswith("user__") for column in columns):
+            columns.add("user")
+            queryset = queryset.select_related("user")
+        return queryset.only("id", "created_at", *columns)
+
+
+class SellerOrderSerializer(SparseFieldsMixin, serializers.Serializer):
+    """The part of an order a seller fulfils, with the totals of that seller's items only."""
+    tx_ref = serializers.CharField(source="order.tx_ref")
+    first_name = serializers.CharField(source="order.user.first_name")
+    last_name = serializers.CharField(source="order.user.last_name")
+    email = serializers.EmailField(source="order.user.email")
+    delivery_status = serializers.CharField()
+    payment_status = serializers.CharField(source="order.payment_status")
+    date_delivered = serializers.DateTimeField()
+    shipping_details = serializers.SerializerMethodField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+    @extend_schema_field(ShippingAddressSerializer)
+    def get_shipping_details(self, obj):
+        return ShippingAddressSerializer(obj.order).data
+
+    # Columns each field reads
+    field_columns = {
+        "tx_ref": ("order__tx_ref",),
+        "first_name": ("order__user__first_name",),
+        "last_name": ("order__user__last_name",),
+        "email": ("order__user__email",),
+        "delivery_status": ("delivery_status",),
+        "payment_status": ("order__payment_status",),
+        "date_delivered": ("date_delivered",),
+        "shipping_details": tuple(
+            f"order__{column}" for column in ("full_name", "email", "phone", "address", "city", "country", "zipcode")
+        ),
+        "subtotal": ("subtotal",),
+        "total": ("total",),
+    }
+
+    @classmethod
+    def prepare(cls, queryset, fields=None):
+        """Fetches only the columns and joins the requested fields read."""
+        if fields is None:
+            return queryset.select_related("order__user")
+        columns = {column for name in fields & cls.field_columns.keys() for column in cls.field_columns[name]}
+        if any(column.startswith("order__user__") for column in columns):
+            columns.add("order__user")
+            queryset = queryset.select_related("order__user")
+        elif any(column.startswith("order__") for column in columns):
+            queryset = queryset.select_related("order")
+        if any(column.startswith("order__") for column in columns):
+            columns.update(("order", "order__id"))
+        return queryset.only("id", "created_at", *columns)
+
 
 class CheckItemOrderSerializer(serializers.Serializer):
     product = ProductSerializer()
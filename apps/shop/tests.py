@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.common.models import ArchivedRow
+from apps.profiles.models import Order, OrderItem, SalesRollup, SellerOrder, ShippingAddress
+from apps.sellers.models import Seller
+from apps.shop.carts import DIRTY_HEAD_KEY, DIRTY_TAIL_KEY, CartStore, cart_cache, flush_dirty_carts
+from apps.shop.fast_serializers import FastOrderItemSerializer, FastProductSerializer, FastReviewSerializer, \
+    ProductExportSerializer
+from apps.shop.importers import ProductImporter, SlugAllocator
+from apps.shop.models import Category, Product, Review
+from apps.shop.purge import purge_soft_deleted
+from apps.shop.serializers import ExportProductSerializer, OrderItemSerializer, OrderSerializer, ProductSerializer, \
+    ReviewSerializer
+
+# Any SCAN step reads the whole table, directly or through an index (USING [COVERING] INDEX)
+FULL_SCAN_RE = re.compile(r"^SCAN (shop_product|shop_review)( |$)")
+# The intended scans: {plan step: SQL the query must contain}. Ordered scans stop at the
+# LIMIT of the page, the paginator COUNT(*) reads the smallest partial index of live rows
+ALLOWED_SCANS = {
+    "SCAN shop_product USING INDEX sqlite_autoindex_shop_product_1": "LIMIT",  # Default ordering, -id
+    "SCAN shop_product USING INDEX shop_product_average_rating_7409f554": "LIMIT",  # ordering=rating
+    "SCAN shop_product USING INDEX product_live_price": "LIMIT",  # Cursor pages by price
+    "SCAN shop_product USING INDEX product_live_in_stock": "COUNT(*)",
+}
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        cart_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="Seller", email="seller@example.com", password="password",
+            account_type="SELLER",
+        )
+        self.seller = Seller.objects.create(
+            user=self.user, business_name="Test Shop", inn_identification_number="1234567890",
+            phone_number="+10000000000", business_description="Test shop", business_address="Street 1",
+            city="City", postal_code="000000", bank_name="Bank", bank_bic_number="123456789",
+            bank_account_number="1234567890", bank_routing_number="1234567890", is_approved=True,
+        )
+        self.category = Category.objects.create(name="Phones", image="category_images/phones.jpg")
+        self.products = [
+            Product.objects.create(
+                seller=self.seller, name=f"Phone {i}", desc="A phone", price_current=100 + i,
+                category=self.category, in_stock=10, image1="product_images/phone.jpg",
+            )
+            for i in range(3)
+        ]
+        Review.objects.create(user=self.user, product=self.products[0], rating=5, text="Great")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_seller(self, email, name):
+        user = User.objects.create_user(
+            first_name="Other", last_name="Seller", email=email, password="password", account_type="SELLER",
+        )
+        return Seller.objects.create(
+            user=user, business_name=name, inn_identification_number="1234567890",
+            phone_number="+10000000000", business_description=name, business_address="Street 2",
+            city="City", postal_code="000000", bank_name="Bank", bank_bic_number="123456789",
+            bank_account_number="1234567890", bank_routing_number="1234567890", is_approved=True,
+        )
+
+
+class QueryPlanTest(CatalogTestCase):
+    def assert_no_full_scan(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        for query in ctx.captured_queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[3] for row in cursor.fetchall()]
+            for step in plan:
+                if FULL_SCAN_RE.match(step):
+                    allowed = ALLOWED_SCANS.get(step)
+                    self.assertTrue(allowed and allowed in query["sql"], f"{url}: {step}\n{query['sql']}")
+
+    def test_catalog_endpoints_use_indexes(self):
+        product = self.products[0]
+        urls = [
+            "/shop/products/",
+            "/shop/products/?min_price=50&max_price=500",
+            "/shop/products/?in_stock=1",
+            "/shop/products/?created_at=2020-01-01T00:00",
+            "/shop/products/?ordering=rating",
+            "/shop/products/?pagination=cursor&ordering=price",
+            "/shop/products/?q=phone",
+            f"/shop/categories/{self.category.slug}/",
+            f"/shop/sellers/{self.seller.slug}/",
+            f"/shop/products/{product.slug}/",
+            f"/shop/products/{product.slug}/review/",
+            f"/shop/products/{product.slug}/review/?min_rating=2&ordering_created=decrease",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_no_full_scan(url)
+
+
+    def test_cursor_pages_use_indexes(self):
+        for ordering in ("price", "-created_at"):
+            with self.subTest(ordering=ordering):
+                response = self.client.get(f"/shop/products/?pagination=cursor&ordering={ordering}&page_size=1")
+                self.assert_no_full_scan(response.data["next"])
+
+class SearchTest(CatalogTestCase):
+    def search(self, query, **params):
+        # Responses are cached until the write commits, which never happens in a TestCase
+        cache.clear()
+        response = self.client.get("/shop/products/", {"q": query, "page_size": 10, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product["slug"] for product in response.data["results"]]
+
+    def create_product(self, name, desc, price=100):
+        return Product.objects.create(
+            seller=self.seller, name=name, desc=desc, price_current=price, category=self.category, in_stock=10,
+            image1="product_images/case.jpg",
+        )
+
+    def test_name_matches_rank_first(self):
+        cable = self.create_product("Cable", "Charges a phone in its case")
+        case = self.create_product("Phone case", "Leather")
+        self.assertEqual(self.search("case"), [case.slug, cable.slug])
+        # Every term must match, as a prefix
+        self.assertEqual(self.search("leath pho"), [case.slug])
+        self.assertEqual(self.search("?!"), [])
+
+    def test_index_follows_writes(self):
+        product = self.create_product("Tablet", "A tablet")
+        self.assertEqual(self.search("tablet"), [product.slug])
+        product.name, product.desc = "Laptop", "A laptop"
+        product.save()
+        self.assertEqual(self.search("tablet"), [])
+        self.assertEqual(self.search("laptop"), [product.slug])
+        product.delete()
+        self.assertEqual(self.search("laptop"), [])
+        Product.objects.unfiltered().filter(pk=product.pk).update(is_deleted=False)
+        self.assertEqual(self.search("laptop"), [product.slug])
+        product.hard_delete()
+        self.assertEqual(self.search("laptop"), [])
+        # Bulk soft deletes go through the update trigger too
+        Product.objects.filter(name__startswith="Phone").delete()
+        self.assertEqual(self.search("phone"), [])
+
+    def test_index_survives_rowid_renumbering(self):
+        # What VACUUM may do to a table without an INTEGER PRIMARY KEY
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE shop_product SET rowid = rowid + 1000")
+        self.assertEqual(sorted(self.search("phone")), sorted(product.slug for product in self.products))
+
+    def test_combines_with_filters(self):
+        case = self.create_product("Phone case", "Leather", price=5)
+        self.assertEqual(self.search("phone", min_price=101, ordering="-price"),
+                         [self.products[2].slug, self.products[1].slug])
+        self.assertEqual(self.search("phone", pagination="cursor", ordering="price", page_size=2),
+                         [case.slug, self.products[0].slug])
+        response = self.client.get("/shop/products/facets/", {"q": "phone", "max_price": 101})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 3)
+
+
+class ProductExportTest(CatalogTestCase):
+    url = "/shop/products/export/"
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content)
+        if params.get("compression") == "gzip":
+            self.assertEqual(response["Content-Type"], "application/gzip")
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.decode().splitlines()], response
+
+    def test_incremental_export(self):
+        since = timezone.now()
+        Product.objects.update(updated_at=since - timedelta(days=1))
+        updated, deleted = self.products[1], self.products[2]
+        updated.price_current = 150
+        updated.save()
+        deleted.delete()
+
+        lines, response = self.export()
+        self.assertEqual([line["slug"] for line in lines], [self.products[0].slug, updated.slug])
+        self.assertIn("X-Export-Started-At", response)
+
+        lines, _ = self.export(updated_since=since.isoformat())
+        self.assertEqual((lines[0]["id"], lines[0]["price_current"]), (str(updated.id), "150.00"))
+        self.assertEqual(lines[1:], [{"id": str(deleted.id), "slug": deleted.slug, "deleted": True}])
+
+        gzipped, response = self.export(updated_since=since.isoformat(), compression="gzip")
+        self.assertEqual(gzipped, lines)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="products.ndjson.gz"')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {"updated_since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"compression": "zip"}).status_code, 400)
+
+
+class ResponseCacheTest(CatalogTestCase):
+    url = "/shop/products/"
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"]
+
+    def test_hit_miss_and_stats(self):
+        self.assertEqual([self.get(), self.get(), self.get()], ["MISS", "HIT", "HIT"])
+        self.assertEqual(self.client.get("/common/cache/stats/").status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get("/common/cache/stats/")
+        self.assertEqual(response.data, {"hits": 2, "misses": 1, "hit_ratio": 0.6667})
+
+    def test_writes_invalidate(self):
+        self.get()
+        writes = [
+            ("product", lambda: self.products[0].save(), "MISS"),
+            ("seller", lambda: self.seller.save(), "MISS"),
+            ("seller avatar", lambda: self.user.save(update_fields=["avatar"]), "MISS"),
+            ("stock", lambda: Product.objects.filter(pk=self.products[0].pk).update(in_stock=9), "MISS"),
+            ("seller login", lambda: self.user.save(update_fields=["last_login"]), "HIT"),
+            ("signup", lambda: User.objects.create_user(
+                first_name="New", last_name="Buyer", email="buyer@example.com", password="password"), "HIT"),
+        ]
+        for name, write, expected in writes:
+            with self.subTest(write=name):
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                self.assertEqual(self.get(), expected)
+                self.assertEqual(self.get(), "HIT")
+
+
+class RatingAggregatesTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyers = [
+            User.objects.create_user(first_name="Buyer", last_name=str(i), email=f"buyer{i}@example.com",
+                                     password="password")
+            for i in range(2)
+        ]
+
+    def ratings(self, product):
+        return tuple(Product.objects.unfiltered().filter(pk=product.pk).values_list(
+            "rating_sum", "rating_count", "average_rating").get())
+
+    def test_single_writes(self):
+        product = self.products[0]
+        review = Review.objects.create(user=self.buyers[0], product=product, rating=2, text="Meh")
+        self.assertEqual(self.ratings(product), (7, 2, Decimal("3.50")))
+        review.rating = 3
+        review.save()
+        self.assertEqual(self.ratings(product), (8, 2, Decimal("4.00")))
+        review.delete()
+        self.assertEqual(self.ratings(product), (5, 1, Decimal("5.00")))
+        Review.objects.get().hard_delete()
+        self.assertEqual(self.ratings(product), (0, 0, Decimal("0.00")))
+
+    def test_bulk_writes(self):
+        for buyer in self.buyers:
+            for product, rating in zip(self.products, (4, 3, 1)):
+                Review.objects.create(user=buyer, product=product, rating=rating, text="Ok")
+        self.assertEqual(self.ratings(self.products[0]), (13, 3, Decimal("4.33")))
+
+        Review.objects.filter(user=self.buyers[0]).update(rating=5)
+        self.assertEqual(self.ratings(self.products[2]), (6, 2, Decimal("3.00")))
+        # Soft delete: the rows leave the filtered queryset with the update itself
+        Review.objects.filter(user=self.buyers[0]).delete()
+        self.assertEqual([self.ratings(product) for product in self.products],
+                         [(9, 2, Decimal("4.50")), (3, 1, Decimal("3.00")), (1, 1, Decimal("1.00"))])
+        Review.objects.filter(user=self.buyers[1]).delete(hard_delete=True)
+        self.assertEqual([self.ratings(product) for product in self.products],
+                         [(5, 1, Decimal("5.00")), (0, 0, Decimal("0.00")), (0, 0, Decimal("0.00"))])
+
+    def test_rating_ordering(self):
+        Review.objects.create(user=self.buyers[0], product=self.products[1], rating=4, text="Good")
+        Review.objects.create(user=self.buyers[1], product=self.products[1], rating=5, text="Great")
+        Review.objects.create(user=self.buyers[0], product=self.products[2], rating=1, text="Bad")
+        cache.clear()
+        response = self.client.get("/shop/products/", {"ordering": "-rating", "page_size": 10})
+        self.assertEqual([product["slug"] for product in response.data["results"]],
+                         [self.products[0].slug, self.products[1].slug, self.products[2].slug])
+        cache.clear()
+        response = self.client.get("/shop/products/", {"ordering": "rating", "page_size": 10})
+        self.assertEqual([product["average_rating"] for product in response.data["results"]],
+                         [1.0, 4.5, 5.0])
+
+
+class ProductImportTest(CatalogTestCase):
+    url = "/sellers/products/import/"
+
+    def upload(self, name, content):
+        response = self.client.post(self.url, {"file": SimpleUploadedFile(name, content)}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def imported(self):
+        return list(Product.objects.exclude(pk__in=[product.pk for product in self.products])
+                    .order_by("name", "slug").values_list("name", "slug", "price_current", "in_stock"))
+
+    def test_csv(self):
+        # Excel writes a BOM, the header must still read "name"
+        content = (
+            "\ufeffname,desc,price_current,category_slug,in_stock,image1\r\n"
+            "Phone 0,Same name as a product,10,phones,,a.jpg\r\n"
+            "Чехол,\"Leather, black\",5.50,phones,3,b.jpg\r\n"
+            "Tablet,A tablet,abc,phones,1,c.jpg\r\n"
+            "Laptop,A laptop,900,laptops,1,d.jpg\r\n"
+        ).encode("utf-8")
+        report = self.upload("products.csv", content)
+        self.assertEqual((report["created"], report["failed"]), (2, 2))
+        self.assertEqual([(error["row"], list(error["errors"])) for error in report["errors"]],
+                         [(3, ["price_current"]), (4, ["category_slug"])])
+        self.assertEqual(self.imported(), [
+            ("Phone 0", "phone-0-2", Decimal("10.00"), 5),
+            ("Чехол", "product", Decimal("5.50"), 3),
+        ])
+
+    def test_jsonl(self):
+        lines = [
+            json.dumps({"name": "Case", "desc": "A case", "price_current": "7", "category_slug": "phones",
+                        "image1": "case.jpg"}),
+            "",
+            "{not json",
+            json.dumps(["a", "list"]),
+            json.dumps({"name": "Case", "desc": "Another case", "price_current": 8, "category_slug": "phones",
+                        "image1": "case2.jpg", "in_stock": 2}),
+        ]
+        report = self.upload("products.jsonl", "\n".join(lines).encode())
+        self.assertEqual((report["created"], report["failed"]), (2, 2))
+        self.assertEqual([error["row"] for error in report["errors"]], [3, 4])
+        self.assertEqual(self.imported(), [
+            ("Case", "case", Decimal("7.00"), 5),
+            ("Case", "case-2", Decimal("8.00"), 2),
+        ])
+
+    def test_unsupported_file(self):
+        response = self.client.post(self.url, {"file": SimpleUploadedFile("products.xlsx", b"x")}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+    def test_slug_allocator(self):
+        for name in ("Case", "Case", "Case", "Casey"):
+            Product.objects.create(seller=self.seller, name=name, desc="A case", price_current=1,
+                                   category=self.category, in_stock=1, image1="case.jpg")
+        Product.objects.filter(slug="case-2").delete()  # Soft deleted slugs stay taken
+        allocator = SlugAllocator()
+        bases = [allocator.base_slug(name) for name in ("Case", "Case", "Cable!", "")]
+        self.assertEqual(bases, ["case", "case", "cable", "product"])
+        with self.assertNumQueries(2):  # slug IN (...), then the "case-*" range
+            allocator.reserve(bases)
+        self.assertEqual([allocator.allocate(base) for base in bases], ["case-4", "case-5", "cable", "product"])
+        # A later batch continues from there without another range scan
+        with self.assertNumQueries(0):
+            allocator.reserve(["case"])
+        self.assertEqual(allocator.allocate("case"), "case-6")
+
+    def test_batch_falls_back_to_single_rows(self):
+        rows = [
+            (1, {"name": "Case", "desc": "A case", "price_current": "7", "category_slug": "phones",
+                 "image1": "case.jpg"}),
+            (2, {"name": "Broken", "desc": "A case", "price_current": "7", "category_slug": "phones",
+                 "image1": "case.jpg"}),
+            (3, {"name": "Cable", "desc": "A cable", "price_current": "3", "category_slug": "phones",
+                 "image1": "cable.jpg"}),
+        ]
+        save = Product.save
+
+        def failing_save(product, *args, **kwargs):
+            if product.name == "Broken":
+                raise IntegrityError("broken row")
+            return save(product, *args, **kwargs)
+
+        # Slugs taken concurrently make the batch insert fail
+        with mock.patch.object(SlugAllocator, "allocate", return_value=self.products[0].slug), \
+                mock.patch.object(Product, "save", autospec=True, side_effect=failing_save):
+            report = ProductImporter(self.seller).run(rows)
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["errors"], [{"row": 2, "errors": {"non_field_errors": ["broken row"]}}])
+        self.assertEqual([(name, slug) for name, slug, _, _ in self.imported()], [("Cable", "cable"), ("Case", "case")])
+
+    @skipUnless(os.environ.get("STRESS_TESTS"), "Set STRESS_TESTS=1 to time a 100k row import")
+    def test_hundred_thousand_rows_per_minute(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["name", "desc", "price_current", "category_slug", "in_stock", "image1"])
+            for i in range(100_000):
+                writer.writerow([f"Product {i % 1000}", "Imported product", "9.99", "phones", i % 50, "p.jpg"])
+            file.flush()
+            started = time.monotonic()
+            call_command("import_products", file.name, seller=self.seller.slug, stdout=StringIO())
+            elapsed = time.monotonic() - started
+        self.assertEqual(Product.objects.count(), 100_003)
+        self.assertLess(elapsed, 60)
+
+
+class ProductFacetsTest(CatalogTestCase):
+    url = "/shop/products/facets/"
+
+    def setUp(self):
+        super().setUp()
+        laptops = Category.objects.create(name="Laptops", image="category_images/laptops.jpg")
+        for name, price, in_stock in (("Laptop", 199.99, 0), ("Notebook", 200, 2), ("Phone case", 0, 5)):
+            Product.objects.create(
+                seller=self.seller, name=name, desc="A computer", price_current=price, category=laptops,
+                in_stock=in_stock, image1="product_images/laptop.jpg",
+            )
+        Product.objects.filter(name="Phone case").update(category=self.category)
+
+    def facets(self, **params):
+        cache.clear()
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_and_bucket_edges(self):
+        data = self.facets()
+        self.assertEqual(data["total"], 6)
+        self.assertEqual([(c["slug"], c["count"]) for c in data["categories"]], [("phones", 4), ("laptops", 2)])
+        # A price on a bucket edge opens the next bucket
+        self.assertEqual([(b["min"], b["max"], b["count"]) for b in data["price"]],
+                         [(0, 100, 1), (100, 200, 4), (200, 300, 1)])
+        self.assertEqual(data["in_stock"], {"in_stock": 5, "out_of_stock": 1})
+
+        data = self.facets(bucket_size=50)
+        self.assertEqual([(b["min"], b["count"]) for b in data["price"]], [(0, 1), (100, 3), (150, 1), (200, 1)])
+        self.assertEqual(self.client.get(self.url, {"bucket_size": 0}).status_code, 400)
+
+    def test_combines_with_filters(self):
+        data = self.facets(min_price=100, in_stock=1)
+        self.assertEqual(data["total"], 4)
+        self.assertEqual([(c["slug"], c["count"]) for c in data["categories"]], [("phones", 3), ("laptops", 1)])
+        self.assertEqual(data["in_stock"], {"in_stock": 4, "out_of_stock": 0})
+
+        data = self.facets(q="phone")
+        self.assertEqual(data["total"], 4)
+        self.assertEqual([(b["min"], b["count"]) for b in data["price"]], [(0, 1), (100, 3)])
+        data = self.facets(q="computer", max_price=199.99)
+        self.assertEqual((data["total"], data["in_stock"]), (2, {"in_stock": 1, "out_of_stock": 1}))
+        self.assertEqual(self.client.get(self.url, {"min_price": "abc"}).status_code, 400)
+
+
+class ConditionalResponseTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = User.objects.create_user(
+            first_name="Test", last_name="Buyer", email="buyer@example.com", password="password",
+        )
+        self.product = self.products[0]
+        # Last-Modified has a one second resolution, move the rows out of the current second.
+        # Reviews first, a bulk review update touches the product
+        past = timezone.now() - timedelta(days=1)
+        for model in (Review, Product, User, Seller, Category):
+            model.objects.update(updated_at=past)
+
+    def assert_not_modified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT").status_code, 200)
+        return etag, last_modified
+
+    def assert_modified(self, url, etag, last_modified=None):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        if last_modified is not None:
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_product(self):
+        url = f"/shop/products/{self.product.slug}/"
+        etag, last_modified = self.assert_not_modified(url)
+        # Another representation of the same product
+        self.assertNotEqual(self.client.get(url, {"fields": "name"})["ETag"], etag)
+        self.assertEqual(self.client.get("/shop/products/missing/").status_code, 404)
+
+        # A review changes the rating shown with the product
+        Review.objects.create(user=self.buyer, product=self.product, rating=1, text="Bad")
+        self.assert_modified(url, etag, last_modified)
+        # Within the same second only the ETag can tell
+        etag, _ = self.assert_not_modified(url)
+        self.seller.business_name = "Renamed Shop"
+        self.seller.save()
+        self.assert_modified(url, etag)
+
+    def test_reviews(self):
+        url = f"/shop/products/{self.product.slug}/review/"
+        etag, last_modified = self.assert_not_modified(url)
+        self.assertNotEqual(self.client.get(url, {"min_rating": 5})["ETag"], etag)
+
+        review = Review.objects.create(user=self.buyer, product=self.product, rating=1, text="Bad")
+        self.assert_modified(url, etag, last_modified)
+        writes = [
+            lambda: Review.objects.filter(pk=review.pk).update(text="Worse"),
+            lambda: review.delete(),
+            # The reviewer's name and avatar are part of the reviews
+            lambda: User.objects.filter(pk=self.user.pk).update(updated_at=timezone.now()),
+        ]
+        for write in writes:
+            etag, _ = self.assert_not_modified(url)
+            write()
+            self.assert_modified(url, etag)
+
+
+class FastSerializerParityTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Cover the nullable/blank branches: old price, extra images, no seller
+        Product.objects.filter(pk=self.products[1].pk).update(
+            price_old=99.5, image2="product_images/back.jpg", image3="product_images/side image.jpg",
+        )
+        Product.objects.filter(pk=self.products[2].pk).update(seller=None)
+        User.objects.filter(pk=self.user.pk).update(avatar="")
+        for product in self.products:
+            OrderItem.objects.create(user=self.user, product=product, quantity=3)
+
+    def assert_parity(self, serializer_class, fast_serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = fast_serializer_class(fast_serializer_class.prepare(queryset), many=True).data
+        self.assertEqual(len(expected), len(actual))
+        for expected_row, actual_row in zip(expected, actual):
+            self.assertEqual(expected_row, actual_row)
+            self.assertEqual(list(expected_row), list(actual_row))
+
+    def test_product(self):
+        queryset = Product.objects.select_related("category", "seller", "seller__user")
+        self.assert_parity(ProductSerializer, FastProductSerializer, queryset)
+
+    def test_product_export(self):
+        queryset = Product.objects.select_related("category", "seller", "seller__user")
+        self.assert_parity(ExportProductSerializer, ProductExportSerializer, queryset)
+
+    def test_order_item(self):
+        queryset = OrderItem.objects.select_related("product", "product__seller")
+        self.assert_parity(OrderItemSerializer, FastOrderItemSerializer, queryset)
+
+    def test_review(self):
+        queryset = Review.objects.select_related("user", "product")
+        self.assert_parity(ReviewSerializer, FastReviewSerializer, queryset)
+
+    def test_product_list_endpoint(self):
+        response = self.client.get("/shop/products/?page_size=10")
+        queryset = Product.objects.select_related("category", "seller", "seller__user")
+        self.assertEqual(response.json()["results"], ProductSerializer(queryset, many=True).data)
+
+
+class ProductListEndpointsTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        other = self.create_seller("other@example.com", "Other Shop")
+        Product.objects.create(
+            seller=other, name="Other Phone", desc="A phone", price_current=90,
+            category=Category.objects.create(name="Tablets", image="category_images/tablets.jpg"),
+            in_stock=10, image1="product_images/phone.jpg",
+        )
+
+    def urls(self):
+        return (
+            f"/shop/categories/{self.category.slug}/",
+            f"/shop/sellers/{self.seller.slug}/",
+            "/sellers/products/",
+        )
+
+    def expected(self):
+        queryset = Product.objects.filter(pk__in=[product.pk for product in self.products])
+        return ProductSerializer(queryset.select_related("category", "seller", "seller__user"), many=True).data
+
+    def test_pages(self):
+        expected = self.expected()
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(f"{url}?page_size=2")
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(list(data), ["count", "next", "previous", "results"])
+                self.assertEqual(data["count"], 3)
+                self.assertIsNone(data["previous"])
+                self.assertEqual(data["results"], expected[:2])
+                data = self.client.get(data["next"]).json()
+                self.assertIsNone(data["next"])
+                self.assertEqual(data["results"], expected[2:])
+
+    def test_ndjson_stream(self):
+        expected = self.expected()
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(f"{url}?stream=ndjson")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                lines = b"".join(response.streaming_content).decode().splitlines()
+                self.assertEqual([json.loads(line) for line in lines], expected)
+
+                response = self.client.get(f"{url}?stream=ndjson&fields=slug,price_current")
+                lines = b"".join(response.streaming_content).decode().splitlines()
+                self.assertEqual(
+                    [json.loads(line) for line in lines],
+                    [{"slug": row["slug"], "price_current": row["price_current"]} for row in expected],
+                )
+
+
+class SparseFieldsetsTest(CatalogTestCase):
+    def selected_columns(self, queryset):
+        with CaptureQueriesContext(connection) as ctx:
+            list(queryset)
+        sql = ctx.captured_queries[0]["sql"]
+        return sql[len("SELECT "):sql.index(" FROM ")].split(", "), sql
+
+    def test_product_columns(self):
+        columns, sql = self.selected_columns(FastProductSerializer.prepare(Product.objects.all(), {"slug", "seller"}))
+        self.assertEqual(set(columns), {
+            '"shop_product"."id"', '"shop_product"."created_at"', '"shop_product"."price_current"',
+            '"shop_product"."slug"', '"sellers_seller"."slug"',
+        })
+        self.assertNotIn("shop_category", sql)
+        self.assertNotIn("accounts_user", sql)
+
+        columns, sql = self.selected_columns(
+            FastProductSerializer.prepare(Product.objects.all(), {"slug", "seller"}, {"seller"})
+        )
+        self.assertIn('"sellers_seller"."business_name"', columns)
+        self.assertIn('"accounts_user"."avatar"', columns)
+        self.assertNotIn("shop_category", sql)
+
+    def test_product_fields(self):
+        response = self.client.get("/shop/products/?page_size=10&fields=slug,seller")
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(
+            response.data["results"],
+            [{"seller": self.seller.slug, "slug": product.slug} for product in self.products],
+        )
+        response = self.client.get("/shop/products/?page_size=10&fields=slug,seller&expand=seller")
+        self.assertEqual(response.data["results"][0]["seller"]["name"], self.seller.business_name)
+
+    def test_order_columns(self):
+        order = Order.objects.create(user=self.user, subtotal=10, total=12)
+        columns, sql = self.selected_columns(OrderSerializer.prepare(Order.objects.all(), {"tx_ref", "total"}))
+        self.assertEqual(set(columns), {
+            '"profiles_order"."id"', '"profiles_order"."created_at"', '"profiles_order"."tx_ref"',
+            '"profiles_order"."total"',
+        })
+        self.assertNotIn("accounts_user", sql)
+
+        columns, sql = self.selected_columns(OrderSerializer.prepare(Order.objects.all(), {"tx_ref", "email"}))
+        self.assertIn('"accounts_user"."email"', columns)
+        self.assertNotIn('"accounts_user"."first_name"', columns)
+
+        response = self.client.get("/profiles/orders/?fields=tx_ref,total")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [{"tx_ref": order.tx_ref, "total": "12.00"}])
+
+    def test_unknown_names_are_rejected(self):
+        for url, key in (
+            ("/shop/products/?fields=slug,sku", "fields"),
+            ("/shop/products/?fields=slug&expand=slug", "expand"),
+            (f"/shop/products/{self.products[0].slug}/?fields=sku", "fields"),
+            (f"/shop/categories/{self.category.slug}/?expand=reviews", "expand"),
+            (f"/shop/products/{self.products[0].slug}/review/?fields=stars", "fields"),
+            ("/shop/cart/?fields=product&expand=user", "expand"),
+            ("/sellers/products/?fields=sku", "fields"),
+            ("/profiles/orders/?fields=tx_ref,items", "fields"),
+            ("/profiles/orders/?expand=user", "expand"),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(key, response.data)
+
+
+@override_settings(CART_FLUSH_INTERVAL=None)
+class CachedCartTest(CatalogTestCase):
+    def add(self, product, quantity):
+        return self.client.post("/shop/cart/", {"slug": product.slug, "quantity": quantity}, format="json")
+
+    def test_cart_writes_are_saved_on_flush(self):
+        response = self.add(self.products[0], 2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["item"]["quantity"], 2)
+        # Only the product lookup once the cart is cached
+        with self.assertNumQueries(1):
+            self.assertEqual(self.add(self.products[1], 1).status_code, 201)
+        self.assertEqual(self.add(self.products[0], 3).status_code, 200)
+        self.assertEqual(self.add(self.products[1], 0).data["item"], None)
+        self.assertFalse(OrderItem.objects.exists())
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/shop/cart/")
+        self.assertEqual([(item["product"]["slug"], item["quantity"]) for item in response.data],
+                         [(self.products[0].slug, 3)])
+
+        self.assertEqual(flush_dirty_carts(), 1)
+        self.assertEqual(list(OrderItem.objects.values_list("product", "quantity")), [(self.products[0].id, 3)])
+        self.assertEqual(flush_dirty_carts(), 0)
+
+    def test_dirty_queue(self):
+        users = [
+            User.objects.create_user(first_name="Buyer", last_name=str(i), email=f"buyer{i}@example.com",
+                                     password="password")
+            for i in range(3)
+        ]
+        carts = [CartStore(user.id) for user in users]
+        for cart in carts:
+            cart.set_quantities({self.products[0].id: 1})
+        self.assertEqual(flush_dirty_carts(older_than=3600), 0)
+        self.assertEqual(flush_dirty_carts(), 3)
+        self.assertEqual(flush_dirty_carts(), 0)
+        self.assertEqual(OrderItem.objects.filter(order=None).count(), 3)
+
+        # Saved before checkout, then changed again: the old slot is skipped, the cart saved once
+        carts[0].set_quantities({self.products[1].id: 2})
+        carts[0].flush()
+        carts[0].set_quantities({self.products[2].id: 3})
+        carts[1].set_quantities({self.products[1].id: 2})
+        with self.assertNumQueries(2 * 4):  # Per cart: read the rows, insert the new one in a savepoint
+            self.assertEqual(flush_dirty_carts(), 2)
+
+        # A slot taken by a mark_dirty that died before writing it holds the queue for one run
+        cart_cache.incr(DIRTY_TAIL_KEY)
+        carts[2].set_quantities({self.products[1].id: 2})
+        self.assertEqual(flush_dirty_carts(), 0)
+        self.assertEqual(flush_dirty_carts(), 1)
+        self.assertEqual(cart_cache.get(DIRTY_HEAD_KEY), cart_cache.get(DIRTY_TAIL_KEY))
+        self.assertEqual(
+            sorted(OrderItem.objects.filter(order=None).values_list("user__email", "product__name", "quantity")),
+            [("buyer0@example.com", "Phone 0", 1), ("buyer0@example.com", "Phone 1", 2),
+             ("buyer0@example.com", "Phone 2", 3), ("buyer1@example.com", "Phone 0", 1),
+             ("buyer1@example.com", "Phone 1", 2), ("buyer2@example.com", "Phone 0", 1),
+             ("buyer2@example.com", "Phone 1", 2)],
+        )
+
+    def test_unsaved_cart_survives_cache_eviction(self):
+        self.add(self.products[0], 2)
+        # More entries than the default cache holds, e.g. cached catalog responses
+        cache.set_many({f"filler:{i}": i for i in range(400)})
+
+        response = self.client.get("/shop/cart/")
+        self.assertEqual([(item["product"]["slug"], item["quantity"]) for item in response.data],
+                         [(self.products[0].slug, 2)])
+        self.assertEqual(flush_dirty_carts(), 1)
+        self.assertEqual(OrderItem.objects.get(order=None).quantity, 2)
+
+    def test_batch_update(self):
+        self.add(self.products[0], 1)
+        items = [
+            {"slug": self.products[0].slug, "quantity": 0},
+            {"slug": self.products[1].slug, "quantity": 2},
+            {"slug": self.products[2].slug, "quantity": 4},
+        ]
+        with self.assertNumQueries(2):
+            response = self.client.post("/shop/cart/batch/", items, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item["product"]["slug"], item["quantity"]) for item in response.data],
+                         [(self.products[2].slug, 4), (self.products[1].slug, 2)])
+
+        response = self.client.post("/shop/cart/batch/", [*items, {"slug": "missing", "quantity": 1}], format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["slugs"], ["missing"])
+        self.assertEqual(len(self.client.get("/shop/cart/").data), 2)
+
+    def test_checkout_sees_unsaved_cart(self):
+        shipping = ShippingAddress.objects.create(user=self.user, full_name="Buyer", email=self.user.email)
+        self.add(self.products[2], 2)
+
+        response = self.client.post("/shop/checkout/", {"shipping_id": str(shipping.id)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OrderItem.objects.get(order__isnull=False).quantity, 2)
+        self.assertEqual(self.client.get("/shop/cart/").data, [])
+
+    def test_checkout_changes_product_etag(self):
+        shipping = ShippingAddress.objects.create(user=self.user, full_name="Buyer", email=self.user.email)
+        url = f"/shop/products/{self.products[0].slug}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.add(self.products[0], 4)
+        # The response cache is invalidated on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/shop/checkout/", {"shipping_id": str(shipping.id)}, format="json")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["in_stock"], 6)
+
+    def test_checkout_snapshots_prices(self):
+        shipping = ShippingAddress.objects.create(user=self.user, full_name="Buyer", email=self.user.email)
+        self.add(self.products[0], 2)
+        self.add(self.products[1], 1)
+        response = self.client.post("/shop/checkout/", {"shipping_id": str(shipping.id)}, format="json")
+        self.assertEqual(response.data["item"]["total"], "301.00")
+        Product.objects.filter(pk=self.products[0].pk).update(price_current=999)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/profiles/orders/")
+        order = response.data["results"][0]
+        self.assertEqual((order["subtotal"], order["total"]), ("301.00", "301.00"))
+        response = self.client.get(f"/profiles/orders/{Order.objects.get().tx_ref}/")
+        self.assertEqual(sorted(item["total"] for item in response.data), [101.0, 200.0])
+
+
+class OrderHistoryTest(CatalogTestCase):
+    def place_orders(self, count, items):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, subtotal=0, total=0)
+            for product in self.products[:items]:
+                OrderItem.objects.create(user=self.user, order=order, product=product, quantity=1,
+                                         unit_price=product.price_current)
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_query_count_does_not_grow_with_page(self):
+        first = self.place_orders(1, 1)
+        small, data = self.count_queries("/profiles/orders/")
+        self.assertEqual(len(data["results"]), 1)
+        order = self.place_orders(5, 3)
+        large, data = self.count_queries("/profiles/orders/?page_size=6")
+        self.assertEqual(len(data["results"]), 6)
+        self.assertEqual(small, large)
+
+        first_items, _ = self.count_queries(f"/profiles/orders/{first.tx_ref}/")
+        items, data = self.count_queries(f"/profiles/orders/{order.tx_ref}/")
+        self.assertEqual(len(data), 3)
+        self.assertEqual(first_items, items)
+
+    def test_cursor_pages(self):
+        self.place_orders(5, 1)
+        response = self.client.get("/profiles/orders/?page_size=3")
+        tx_refs = [order["tx_ref"] for order in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        tx_refs += [order["tx_ref"] for order in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(tx_refs, list(Order.objects.order_by("-created_at", "-id").values_list("tx_ref", flat=True)))
+
+    def test_cursor_pages_with_equal_timestamps(self):
+        self.place_orders(5, 1)
+        Order.objects.update(created_at=timezone.now())
+        for ordering, order_by in (("created_at", ("created_at", "id")), (None, ("-created_at", "-id"))):
+            with self.subTest(ordering=ordering):
+                url = "/profiles/orders/?page_size=2" + (f"&ordering={ordering}" if ordering else "")
+                tx_refs = []
+                while url:
+                    response = self.client.get(url)
+                    tx_refs += [order["tx_ref"] for order in response.data["results"]]
+                    url = response.data["next"]
+                self.assertEqual(tx_refs, list(Order.objects.order_by(*order_by).values_list("tx_ref", flat=True)))
+        self.assertEqual(self.client.get("/profiles/orders/?ordering=price").status_code, 400)
+
+
+class ProductCursorPaginationTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Ties on the price and on the creation time
+        created_at = self.products[0].created_at
+        for i in range(4):
+            product = Product.objects.create(
+                seller=self.seller, name=f"Case {i}", desc="A case", price_current=101,
+                category=self.category, in_stock=10, image1="product_images/case.jpg",
+            )
+            Product.objects.filter(pk=product.pk).update(created_at=created_at)
+
+    def walk(self, url, key):
+        """Follows the `key` links from `url`, returns the slugs of every page and the last response."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([product["slug"] for product in response.data["results"]])
+            last, url = response.data, response.data[key]
+        return pages, last
+
+    def test_pages_follow_the_full_ordering(self):
+        for ordering, order_by in (
+            ("price", ("price_current", "id")),
+            ("-price", ("-price_current", "-id")),
+            ("created_at", ("created_at", "id")),
+            ("-created_at", ("-created_at", "-id")),
+        ):
+            with self.subTest(ordering=ordering):
+                expected = list(Product.objects.order_by(*order_by).values_list("slug", flat=True))
+                pages, last = self.walk(f"/shop/products/?pagination=cursor&ordering={ordering}&page_size=2", "next")
+                self.assertEqual(sum(pages, []), expected)
+                self.assertEqual(len(pages), 4)
+                # Walking back from the last page returns the same pages
+                backward, _ = self.walk(last["previous"], "previous")
+                self.assertEqual(backward[::-1], pages[:-1])
+
+    def test_unsupported_ordering_is_rejected(self):
+        response = self.client.get("/shop/products/?pagination=cursor&ordering=rating")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.data)
+        self.assertEqual(self.client.get("/shop/products/?ordering=rating").status_code, 200)
+
+    def test_invalid_cursor(self):
+        for position in ("not json", '["1"]', '["abc","1"]'):
+            with self.subTest(position=position):
+                cursor = base64.b64encode(urlencode({"p": position}).encode()).decode()
+                response = self.client.get(f"/shop/products/?pagination=cursor&ordering=price&cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CART_FLUSH_INTERVAL=None)
+class SellerOrdersTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        other = self.create_seller("other@example.com", "Other Shop")
+        self.other_product = Product.objects.create(
+            seller=other, name="Case", desc="A case", price_current=7, category=self.category, in_stock=10,
+            image1="product_images/case.jpg",
+        )
+        shipping = ShippingAddress.objects.create(user=self.user, full_name="Buyer", email=self.user.email)
+        items = [
+            {"slug": self.products[0].slug, "quantity": 1},
+            {"slug": self.products[1].slug, "quantity": 2},
+            {"slug": self.other_product.slug, "quantity": 3},
+        ]
+        self.client.post("/shop/cart/batch/", items, format="json")
+        response = self.client.post("/shop/checkout/", {"shipping_id": str(shipping.id)}, format="json")
+        self.tx_ref = response.data["item"]["tx_ref"]
+
+    def test_checkout_splits_order_per_seller(self):
+        self.assertEqual(Order.objects.get().total, 323)
+        self.assertEqual(sorted(SellerOrder.objects.values_list("total", flat=True)), [21, 302])
+
+        # The seller, then one page of sub-orders joined with their order and buyer
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(2):
+            response = self.client.get("/sellers/orders/")
+        self.assertEqual(len(response.data["results"]), 1)
+        order = response.data["results"][0]
+        self.assertEqual((order["tx_ref"], order["total"]), (self.tx_ref, "302.00"))
+
+        response = self.client.get(f"/sellers/orders/{self.tx_ref}/")
+        self.assertEqual(sorted(item["product"]["slug"] for item in response.data),
+                         [self.products[0].slug, self.products[1].slug])
+
+
+    def test_sales_rollups(self):
+        today = timezone.localdate()
+        response = self.client.get("/sellers/analytics/sales/", {"start": today - timedelta(days=2), "end": today})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totals"], {"orders": 1, "units": 3, "revenue": "302.00"})
+        self.assertEqual([day["orders"] for day in response.data["days"]], [0, 0, 1])
+        products = [(product["slug"], product["units"], product["revenue"]) for product in response.data["products"]]
+        self.assertEqual(products, [(self.products[1].slug, 2, "202.00"), (self.products[0].slug, 1, "100.00")])
+        incremental = set(SalesRollup.objects.values_list("seller", "product", "day", "orders", "units", "revenue"))
+        SalesRollup.rebuild()
+        rebuilt = set(SalesRollup.objects.values_list("seller", "product", "day", "orders", "units", "revenue"))
+        self.assertEqual(incremental, rebuilt)
+
+        self.assertTrue(Order.objects.get().cancel())
+        response = self.client.get("/sellers/analytics/sales/")
+        self.assertEqual(response.data["totals"], {"orders": 0, "units": 0, "revenue": "0.00"})
+        self.assertEqual(len(response.data["days"]), 30)
+
+
+    def test_rollup_row_created_concurrently(self):
+        def rollups():
+            rows = SalesRollup.objects.values_list("seller", "product", "day", "orders", "units", "revenue")
+            return {row[:3]: row[3:] for row in rows}
+
+        once = rollups()
+        competing = list(SalesRollup.objects.all())
+        SalesRollup.objects.all().delete()
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            updated = update(queryset, **kwargs)
+            if not updated and competing:
+                # Another checkout inserts the rows between this update and the insert
+                SalesRollup.objects.bulk_create(competing)
+                competing.clear()
+            return updated
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=racing_update):
+            SalesRollup.record(Order.objects.get())
+        self.assertEqual(rollups(), {key: tuple(2 * value for value in values) for key, values in once.items()})
+
+class SellerBulkUpdateTest(CatalogTestCase):
+    url = "/sellers/products/bulk/"
+
+    def prices(self):
+        return list(Product.objects.order_by("name").values_list("price_current", "price_old", "in_stock"))
+
+    def test_bulk_update_matches_put(self):
+        items = [
+            {"slug": self.products[0].slug, "price_current": "150.00"},
+            {"slug": self.products[1].slug, "in_stock": 0},
+            {"slug": self.products[2].slug, "price_current": "102.00", "in_stock": 3},
+        ]
+        response = self.client.patch(self.url, items, format="json")
+        self.assertEqual((response.status_code, response.data), (200, {"updated": 3}))
+        # Like SellerProductView.put, a changed price is stored in price_old too
+        self.assertEqual(self.prices(), [(150, 150, 10), (101, None, 0), (102, None, 3)])
+
+    def test_batch_is_all_or_nothing(self):
+        other = self.create_seller("other@example.com", "Other Shop")
+        foreign = Product.objects.create(
+            seller=other, name="Case", desc="A case", price_current=7, category=self.category, in_stock=1,
+            image1="product_images/case.jpg",
+        )
+        before = self.prices()
+        items = [{"slug": self.products[0].slug, "price_current": "1.00"}, {"slug": foreign.slug, "in_stock": 0}]
+        response = self.client.patch(self.url, items, format="json")
+        self.assertEqual((response.status_code, response.data["slugs"]), (403, [foreign.slug]))
+
+        items = [{"slug": self.products[0].slug, "price_current": "1.00"}, {"slug": "missing", "in_stock": 0}]
+        response = self.client.patch(self.url, items, format="json")
+        self.assertEqual((response.status_code, response.data["slugs"]), (404, ["missing"]))
+        self.assertEqual(self.prices(), before)
+
+
+class PurgeDeletedTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = User.objects.create_user(
+            first_name="Test", last_name="Buyer", email="buyer@example.com", password="password",
+        )
+        order = Order.objects.create(user=self.user, subtotal=100, total=100)
+        OrderItem.objects.create(user=self.user, order=order, product=self.products[0], quantity=1)
+        OrderItem.objects.create(user=self.buyer, product=self.products[1], quantity=1)
+        Review.objects.create(user=self.buyer, product=self.products[1], rating=1, text="Bad")
+        Review.objects.create(user=self.buyer, product=self.products[2], rating=2, text="Meh")
+        long_ago = timezone.now() - timedelta(days=100)
+        Product.objects.filter(pk__in=[self.products[0].pk, self.products[1].pk]).delete()
+        Product.objects.unfiltered().update(deleted_at=long_ago)
+        User.objects.filter(pk=self.buyer.pk).update(is_deleted=True, deleted_at=long_ago)
+        Product.objects.filter(pk=self.products[2].pk).delete()  # Within the retention period
+
+    def purge(self, **kwargs):
+        return {stats["model"]: stats for stats in purge_soft_deleted(retention_days=90, **kwargs)}
+
+    def test_purge_keeps_ordered_rows(self):
+        results = self.purge(archive=True, batch_size=1)
+        self.assertEqual([(stats["purged"], stats["kept"]) for stats in results.values()], [(0, 0), (1, 1), (1, 0)])
+        self.assertEqual(set(Product.objects.unfiltered().values_list("pk", flat=True)),
+                         {self.products[0].pk, self.products[2].pk})
+        self.assertFalse(User.objects.filter(pk=self.buyer.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order=None).exists())
+        self.assertEqual(Product.objects.unfiltered().get(pk=self.products[2].pk).rating_count, 0)
+        archived = sorted(ArchivedRow.objects.values_list("model", flat=True))
+        self.assertEqual(archived, ["accounts.User", "shop.Product", "shop.Review", "shop.Review"])
+        self.assertEqual(ArchivedRow.objects.get(object_id=self.products[1].pk).data["name"], "Phone 1")
+
+    def test_purge_keeps_sellers_with_products_for_sale(self):
+        seller = Seller.objects.create(user=self.buyer, business_name="Buyer Shop", inn_identification_number="1")
+        product = Product.objects.create(
+            seller=seller, name="Case", desc="A case", price_current=7, category=self.category, in_stock=1,
+            image1="product_images/case.jpg",
+        )
+        self.assertEqual(self.purge(archive=True, models=["accounts.User"])["accounts.User"]["kept"], 1)
+        self.assertTrue(User.objects.filter(pk=self.buyer.pk).exists())
+
+        product.delete()
+        self.assertEqual(self.purge(archive=True, models=["accounts.User"])["accounts.User"]["purged"], 1)
+        self.assertIsNone(Product.objects.unfiltered().get(pk=product.pk).seller)
+        archived = ArchivedRow.objects.get(model="shop.Product", object_id=product.pk)
+        self.assertEqual(archived.data["seller_id"], str(seller.pk))
+
+    def test_purge_resumes(self):
+        results = self.purge(archive=False, time_limit=0)
+        self.assertFalse(any(stats["finished"] for stats in results.values()))
+        self.assertEqual(Product.objects.unfiltered().count(), 3)
+        self.assertEqual(self.purge(archive=False)["shop.Product"]["purged"], 1)
+        self.assertEqual(self.purge(archive=False)["shop.Product"]["purged"], 0)
+        self.assertFalse(ArchivedRow.objects.exists())
+
+
+class CheckoutConcurrencyTest(TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        cache.clear()
+        cart_cache.clear()
+        seller_user = User.objects.create_user(
+            first_name="Hot", last_name="Seller", email="hot@example.com", password="password",
+        )
+        seller = Seller.objects.create(
+            user=seller_user, business_name="Hot Shop", inn_identification_number="1234567890",
+            phone_number="+10000000000", business_description="Hot shop", business_address="Street 1",
+            city="City", postal_code="000000", bank_name="Bank", bank_bic_number="123456789",
+            bank_account_number="1234567890", bank_routing_number="1234567890", is_approved=True,
+        )
+        category = Category.objects.create(name="Consoles", image="category_images/consoles.jpg")
+        self.product = Product.objects.create(
+            seller=seller, name="Hot Console", desc="Limited", price_current=500, category=category,
+            in_stock=self.stock, image1="product_images/console.jpg",
+        )
+        self.carts = []
+        for i in range(self.buyers):
+            # CheckoutView only lets SELLER accounts in
+            buyer = User.objects.create_user(
+                first_name="Buyer", last_name=str(i), email=f"buyer{i}@example.com", password="password",
+                account_type="SELLER",
+            )
+            shipping = ShippingAddress.objects.create(user=buyer, full_name=f"Buyer {i}", email=buyer.email)
+            OrderItem.objects.create(user=buyer, product=self.product, quantity=1)
+            self.carts.append((buyer, shipping))
+
+    def checkout_concurrently(self):
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+
+        def checkout(buyer, shipping):
+            client = APIClient()
+            client.force_authenticate(buyer)
+            try:
+                barrier.wait()
+                response = client.post("/shop/checkout/", {"shipping_id": str(shipping.id)}, format="json")
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=cart) for cart in self.carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_hot_product_is_never_oversold(self):
+        statuses = self.checkout_concurrently()
+
+        self.assertEqual(len(statuses), self.buyers)
+        self.assertEqual(statuses.count(200), self.stock)
+        self.assertEqual(statuses.count(409), self.buyers - self.stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        # Failed checkouts leave their cart untouched
+        self.assertEqual(OrderItem.objects.filter(order=None).count(), self.buyers - self.stock)
+
+    def test_cancel_releases_stock_once(self):
+        self.checkout_concurrently()
+        order = Order.objects.select_related("user").first()
+        client = APIClient()
+        client.force_authenticate(order.user)
+
+        response = client.post(f"/profiles/orders/{order.tx_ref}/cancel/")
+        self.assertEqual(response.status_code, 200)
+        response = client.post(f"/profiles/orders/{order.tx_ref}/cancel/")
+        self.assertEqual(response.status_code, 409)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock, 1)
@@ -1,14 +1,17 @@
 from django.urls import path
 
-from apps.shop.views import CategoriesView,ReviewView,ReviewsView, ProductsByCategoryView, ProductsBySellerView, ProductsView, ProductView,CartView, CheckoutView
+from apps.shop.views import CategoriesView,ReviewView,ReviewsView, ProductsByCategoryView, ProductsBySellerView, ProductsView, ProductFacetsView, ProductsExportView, ProductView,CartView, CartBatchView, CheckoutView
 
 urlpatterns = [
     path("categories/", CategoriesView.as_view()),
     path("categories/<slug:slug>/", ProductsByCategoryView.as_view()),
     path("sellers/<slug:slug>/", ProductsBySellerView.as_view()),
     path("products/", ProductsView.as_view()),
+    path("products/facets/", ProductFacetsView.as_view()),
+    path("products/export/", ProductsExportView.as_view()),
     path("products/<slug:slug>/", ProductView.as_view()),
     path("cart/", CartView.as_view()),
+    path("cart/batch/", CartBatchView.as_view()),
     path("checkout/", CheckoutView.as_view()),
     path("products/<slug:slug>/review/", ReviewsView.as_view()),
     path("products/review/<uuid:id>/", ReviewView.as_view()),
@@ -1,3 +1,10 @@
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -5,13 +12,25 @@ from rest_framework import status
 from apps.sellers.models import Seller
 from apps.shop.models import Category, Product, Review
 from apps.shop.filters import ProductFilter, ReviewFilter
-from apps.profiles.models import OrderItem, ShippingAddress, Order
+from apps.profiles.models import OrderItem, ShippingAddress, Order, SalesRollup, SellerOrder
 from apps.common.permissions import IsSeller, IsOwnerOrReadOnly
-from apps.common.paginations import CustomPagination
-from apps.shop.schema_examples import PRODUCT_PARAM_EXAMPLE, REVIEW_PARAM_EXAMPLE
+from apps.common.paginations import CustomPagination, CustomCursorPagination
+from apps.shop.schema_examples import PRODUCT_PARAM_EXAMPLE, REVIEW_PARAM_EXAMPLE, PRODUCT_FACETS_PARAM_EXAMPLE, \
+    PRODUCT_LIST_PARAM_EXAMPLE, SPARSE_FIELDS_PARAM_EXAMPLE, PRODUCT_EXPORT_PARAM_EXAMPLE, IDEMPOTENCY_KEY_PARAM_EXAMPLE
 from apps.shop.serializers import OrderItemSerializer, ToggleCartItemSerializer, CheckoutSerializer, \
-    OrderSerializer, CategorySerializer, ProductSerializer, CreateReviewSerializer, ReviewSerializer
+    OrderSerializer, CategorySerializer, ProductSerializer, CreateReviewSerializer, ReviewSerializer, \
+    ProductFacetsSerializer, ProductFacetsParamsSerializer, ProductExportParamsSerializer, ExportProductSerializer
+from apps.shop.facets import product_facets
+from apps.shop.fast_serializers import FastProductSerializer, FastOrderItemSerializer, FastReviewSerializer, \
+    datetime_representation
+from django.db.models import Count, Max
 from apps.common.utils import set_dict_attr
+from apps.common.cache import cache_response, conditional_response
+from apps.common.idempotency import idempotent
+from apps.common.streaming import GZIP_CONTENT_TYPE, NDJSON_CONTENT_TYPE, ndjson_response, wants_ndjson
+from apps.shop.carts import CART_PRODUCT_VALUES, CartStore, cart_row, cart_rows
+from apps.shop.exports import iter_export
+from apps.common.serializers import sparse_fieldsets
 
 tags = ["Shop"]
 
@@ -27,6 +46,7 @@ class CategoriesView(APIView):
         """,
         tags=tags
     )
+    @cache_response(Category)
     def get(self, request, *args, **kwargs):
         categories = Category.objects.all()
         serializer = self.serializer_class(categories, many=True)
@@ -52,6 +72,8 @@ class CategoriesView(APIView):
 class ProductsByCategoryView(APIView):
     permission_classes = [IsSeller]
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
+    pagination_class = CustomPagination
 
     @extend_schema(
         operation_id="category_products",
@@ -59,90 +81,194 @@ class ProductsByCategoryView(APIView):
         description="""
             This endpoint returns all products in a particular category.
         """,
-        tags=tags
+        tags=tags,
+        parameters=PRODUCT_LIST_PARAM_EXAMPLE,
     )
+    @cache_response(Product, Category, Seller, Review)
     def get(self, request, *args, **kwargs):
         category = Category.objects.get_or_none(slug=kwargs["slug"])
         if not category:
             return Response(data={"message": "Category does not exist!"}, status=404)
-        products = Product.objects.select_related("category", "seller", "seller__user").filter(category=category)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+        products = self.read_serializer_class.prepare(Product.objects.filter(category=category), fields, expand)
+        if wants_ndjson(request):
+            return ndjson_response(products, self.read_serializer_class, fields=fields, expand=expand)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(products, request)
+        serializer = self.read_serializer_class(paginated_queryset, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProductsView(APIView):
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
     pagination_class = CustomPagination
+    cursor_pagination_class = CustomCursorPagination
+
+    def get_paginator(self, request):
+        # ?pagination=cursor (or an existing cursor) switches to keyset pagination
+        if request.query_params.get("pagination") == "cursor" or "cursor" in request.query_params:
+            return self.cursor_pagination_class()
+        return self.pagination_class()
 
     @extend_schema(
         operation_id="all_products",
         summary="Product Fetch",
         description="""
             This endpoint returns all products.
+            Pass pagination=cursor to get opaque next/previous cursors instead of page numbers.
         """,
         tags=tags,
         parameters=PRODUCT_PARAM_EXAMPLE,
     )
+    @cache_response(Product, Category, Seller, Review)
     def get(self, request, *args, **kwargs):
-        products = Product.objects.select_related("category", "seller", "seller__user").all()
+        products = Product.objects.all()
         filter_set = ProductFilter(request.GET, queryset=products)
         if filter_set.is_valid():
-            queryset = filter_set.qs
-            paginator = self.pagination_class()
+            fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+            queryset = self.read_serializer_class.prepare(filter_set.qs, fields, expand)
+            paginator = self.get_paginator(request)
             paginated_queryset = paginator.paginate_queryset(queryset, request)
-            serializer = self.serializer_class(paginated_queryset, many=True)
+            serializer = self.read_serializer_class(paginated_queryset, many=True, fields=fields, expand=expand)
             return paginator.get_paginated_response(serializer.data)
         else:
             return Response(filter_set.errors, status=400)
 
 
+class ProductsExportView(APIView):
+    serializer_class = ExportProductSerializer
+
+    @extend_schema(
+        operation_id="products_export",
+        summary="Product Catalog Export",
+        description="""
+            This endpoint streams every live product with its seller and category as NDJSON,
+            one product per line, in order of last change.
+            For incremental exports pass the X-Export-Started-At header of the previous export
+            as updated_since: the products deleted since then follow as {"id", "slug", "deleted": true} lines.
+            Seller and category changes alone do not put a product in an incremental export.
+        """,
+        tags=tags,
+        parameters=PRODUCT_EXPORT_PARAM_EXAMPLE,
+        responses={(200, NDJSON_CONTENT_TYPE): ExportProductSerializer},
+    )
+    def get(self, request, *args, **kwargs):
+        params = ProductExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # Rows changed while streaming are picked up again by the next export
+        started_at = timezone.now()
+        compression = params.validated_data.get("compression")
+        chunks = iter_export(params.validated_data.get("updated_since"), compression, context={"request": request})
+        if compression == "gzip":
+            response = StreamingHttpResponse(chunks, content_type=GZIP_CONTENT_TYPE)
+            response["Content-Disposition"] = 'attachment; filename="products.ndjson.gz"'
+        else:
+            response = StreamingHttpResponse(chunks, content_type=NDJSON_CONTENT_TYPE)
+        response["X-Export-Started-At"] = datetime_representation(started_at)
+        return response
+
+
+class ProductFacetsView(APIView):
+    serializer_class = ProductFacetsSerializer
+
+    @extend_schema(
+        operation_id="products_facets",
+        summary="Product Facets Fetch",
+        description="""
+            This endpoint returns category, price bucket and stock counts for the products
+            matching the same filters as the product list.
+        """,
+        tags=tags,
+        parameters=PRODUCT_PARAM_EXAMPLE + PRODUCT_FACETS_PARAM_EXAMPLE,
+    )
+    @cache_response(Product, Category)
+    def get(self, request, *args, **kwargs):
+        params = ProductFacetsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filter_set = ProductFilter(request.GET, queryset=Product.objects.all())
+        if filter_set.is_valid():
+            facets = product_facets(filter_set.qs, params.validated_data["bucket_size"])
+            serializer = self.serializer_class(facets)
+            return Response(data=serializer.data, status=200)
+        else:
+            return Response(filter_set.errors, status=400)
+
+
 class ProductsBySellerView(APIView):
     permission_classes = [IsSeller]
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
+    pagination_class = CustomPagination
 
     @extend_schema(
         summary="Seller Products Fetch",
         description="""
             This endpoint returns all products in a particular seller.
         """,
-        tags=tags
+        tags=tags,
+        parameters=PRODUCT_LIST_PARAM_EXAMPLE,
     )
+    @cache_response(Product, Category, Seller, Review)
     def get(self, request, *args, **kwargs):
         seller = Seller.objects.get_or_none(slug=kwargs["slug"])
         if not seller:
             return Response(data={"message": "Seller does not exist!"}, status=404)
-        products = Product.objects.select_related("category", "seller", "seller__user").filter(seller=seller)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+        products = self.read_serializer_class.prepare(Product.objects.filter(seller=seller), fields, expand)
+        if wants_ndjson(request):
+            return ndjson_response(products, self.read_serializer_class, fields=fields, expand=expand)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(products, request)
+        serializer = self.read_serializer_class(paginated_queryset, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProductView(APIView):
     permission_classes = [IsSeller]
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
 
-    def get_object(self, slug):
-        product = Product.objects.get_or_none(slug=slug)
+    def get_object(self, slug, fields=None, expand=None):
+        product = self.read_serializer_class.prepare(Product.objects.filter(slug=slug), fields, expand).first()
         return product
 
+    def get_validators(self, request, *args, **kwargs):
+        # Everything ProductSerializer renders, read in one narrow query
+        row = Product.objects.filter(slug=kwargs["slug"]).values_list(
+            "id", "updated_at", "rating_sum", "rating_count",
+            "seller__updated_at", "seller__user__updated_at", "category__updated_at",
+        ).first()
+        if row is None:
+            return None
+        params = sorted(request.query_params.lists())
+        return (row, params), max(value for value in row[1:] if isinstance(value, datetime))
+
     @extend_schema(
         operation_id="product_detail",
         summary="Product Details Fetch",
         description="""
             This endpoint returns the details for a product via the slug.
+            Supports conditional requests through ETag / Last-Modified.
         """,
-        tags=tags
+        tags=tags,
+        parameters=SPARSE_FIELDS_PARAM_EXAMPLE,
     )
+    @conditional_response("get_validators")
+    @cache_response(Product, Category, Seller, Review)
     def get(self, request, *args, **kwargs):
-        product = self.get_object(kwargs['slug'])
+        fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+        product = self.get_object(kwargs['slug'], fields, expand)
         if not product:
             return Response(data={"message": "Product does not exist!"}, status=404)
-        serializer = self.serializer_class(product)
+        serializer = self.read_serializer_class(product, fields=fields, expand=expand)
         return Response(data=serializer.data, status=200)
 
 
 class CartView(APIView):
     permission_classes = [IsSeller]
     serializer_class = OrderItemSerializer
+    read_serializer_class = FastOrderItemSerializer
 
     @extend_schema(
         summary="Cart Items Fetch",
@@ -150,12 +276,13 @@ class CartView(APIView):
             This endpoint returns all items in a user cart.
         """,
         tags=tags,
+        parameters=SPARSE_FIELDS_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
         user = request.user
-        orderitems = OrderItem.objects.filter(user=user, order=None).select_related(
-            "product", "product__seller", "product__seller__user")
-        serializer = self.serializer_class(orderitems, many=True)
+        fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+        orderitems = cart_rows(CartStore(user.pk).items(), fields, expand)
+        serializer = self.read_serializer_class(orderitems, many=True, fields=fields, expand=expand)
         return Response(data=serializer.data)
 
     @extend_schema(
@@ -166,7 +293,9 @@ class CartView(APIView):
         """,
         tags=tags,
         request=ToggleCartItemSerializer,
+        parameters=IDEMPOTENCY_KEY_PARAM_EXAMPLE,
     )
+    @idempotent()
     def post(self, request, *args, **kwargs):
         user = request.user
         serializer = ToggleCartItemSerializer(data=request.data)
@@ -175,30 +304,64 @@ class CartView(APIView):
         data = serializer.validated_data
         quantity = data["quantity"]
 
-        product = Product.objects.select_related("seller", "seller__user").get_or_none(slug=data["slug"])
+        product = Product.objects.filter(slug=data["slug"]).values("id", *CART_PRODUCT_VALUES).first()
         if not product:
             return Response({"message": "No Product with that slug"}, status=404)
-        orderitem, created = OrderItem.objects.update_or_create(
-            user=user,
-            order_id=None,
-            product=product,
-            defaults={"quantity": quantity},
-        )
+        product_id = product.pop("id")
+        change = CartStore(user.pk).set_quantities({product_id: quantity})[product_id]
         resp_message_substring = "Updated In"
         status_code = 200
-        if created:
+        if change == "added":
             status_code = 201
             resp_message_substring = "Added To"
-        if quantity == 0:
+        if change == "removed":
             resp_message_substring = "Removed From"
-            orderitem.delete()
             data = None
         if resp_message_substring != "Removed From":
-            serializer = self.serializer_class(orderitem)
+            serializer = self.read_serializer_class(cart_row(product, quantity))
             data = serializer.data
         return Response(data={"message": f"Item {resp_message_substring} Cart", "item": data}, status=status_code)
 
 
+class CartBatchView(APIView):
+    permission_classes = [IsSeller]
+    serializer_class = ToggleCartItemSerializer
+    read_serializer_class = FastOrderItemSerializer
+
+    @extend_schema(
+        summary="Batch update cart",
+        description="""
+            This endpoint allows a user to add/update/remove many items in cart at once,
+            e.g. a saved list or a previous order. If quantity is 0, the item is removed from cart.
+            Either every item is applied or none: unknown slugs return 404.
+            The response is the whole updated cart.
+        """,
+        tags=tags,
+        request=ToggleCartItemSerializer(many=True),
+        responses=OrderItemSerializer(many=True),
+        parameters=IDEMPOTENCY_KEY_PARAM_EXAMPLE,
+    )
+    @idempotent()
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        serializer = self.serializer_class(data=request.data, many=True, allow_empty=False)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=400)
+        quantities = {item["slug"]: item["quantity"] for item in serializer.validated_data}
+        if len(quantities) != len(serializer.validated_data):
+            return Response(data={"message": "Every slug must appear only once"}, status=400)
+        # One query resolves every slug
+        products = dict(Product.objects.filter(slug__in=quantities).order_by().values_list("slug", "id"))
+        missing = quantities.keys() - products.keys()
+        if missing:
+            return Response(data={"message": "Products do not exist!", "slugs": sorted(missing)}, status=404)
+        cart = CartStore(user.pk)
+        cart.set_quantities({products[slug]: quantity for slug, quantity in quantities.items()})
+        orderitems = cart_rows(cart.items())
+        serializer = self.read_serializer_class(orderitems, many=True)
+        return Response(data=serializer.data, status=200)
+
+
 class CheckoutView(APIView):
     permission_classes = [IsSeller]
     serializer_class = CheckoutSerializer
@@ -207,11 +370,20 @@ class CheckoutView(APIView):
         summary="Checkout",
         description="""
                This endpoint allows a user to create an order through which payment can then be made through.
+               The stock of every item is reserved; when an item is short nothing is ordered
+               and the short items are returned with a 409.
                """,
         tags=tags,
         request=CheckoutSerializer,
+        parameters=IDEMPOTENCY_KEY_PARAM_EXAMPLE,
     )
+    @idempotent()
     def post(self, request, *args, **kwargs):
+        # The cached cart is saved first and cannot change until the order is placed
+        with CartStore(request.user.pk).flushed():
+            return self.checkout(request)
+
+    def checkout(self, request):
         # Proceed to checkout
         user = request.user
         orderitems = OrderItem.objects.filter(user=user, order=None)
@@ -242,15 +414,63 @@ class CheckoutView(APIView):
             value = getattr(shipping, field)
             data[field] = value
 
-        order = Order.objects.create(user=user, **data)
-        orderitems.update(order=order)
+        with transaction.atomic():
+            # Lock the cart rows: a repeated submit waits here, then finds an empty cart
+            items = list(orderitems.select_for_update(of=("self",)).select_related("product"))
+            if not items:
+                return Response({"message": "No Items in Cart"}, status=404)
+            quantities = defaultdict(int)
+            for item in items:
+                quantities[item.product_id] += item.quantity
+            short = Product.reserve_stock(quantities)
+            if short:
+                short_items = self.short_items(items, quantities, short)
+                transaction.set_rollback(True)
+                return Response(data={"message": "Not enough stock", "items": short_items}, status=409)
+            # Prices are fixed now, later repricing does not change the order
+            subtotal = 0
+            for item in items:
+                item.unit_price = item.product.price_current
+                subtotal += item.unit_price * item.quantity
+            order = Order.objects.create(user=user, subtotal=subtotal, total=subtotal, **data)
+            # Every seller fulfils its own part of the order
+            seller_orders = {}
+            for item in items:
+                item.order = order
+                seller_id = item.product.seller_id
+                if seller_id is None:
+                    continue
+                if seller_id not in seller_orders:
+                    seller_orders[seller_id] = SellerOrder(order=order, seller_id=seller_id)
+                seller_order = seller_orders[seller_id]
+                seller_order.subtotal += item.get_total
+                seller_order.total = seller_order.subtotal
+                item.seller_order = seller_order
+            SellerOrder.objects.bulk_create(seller_orders.values())
+            OrderItem.objects.bulk_update(items, ["order", "unit_price", "seller_order"])
+            SalesRollup.record(order)
 
         serializer = OrderSerializer(order)
         return Response(data={"message": "Checkout Successful", "item": serializer.data}, status=200)
 
+    @staticmethod
+    def short_items(items, quantities, short):
+        # Stock left for each short product, 0 when it is no longer on sale
+        in_stock = dict(Product.objects.filter(pk__in=short).values_list("pk", "in_stock"))
+        products = {item.product_id: item.product for item in items}
+        return [
+            {
+                "slug": products[product_id].slug,
+                "quantity": quantities[product_id],
+                "in_stock": in_stock.get(product_id, 0),
+            }
+            for product_id in short
+        ]
+
 
 class ReviewsView(APIView):
     serializer_class = CreateReviewSerializer
+    read_serializer_class = FastReviewSerializer
     permission_classes = [IsOwnerOrReadOnly]
     pagination_class = CustomPagination
 
@@ -258,16 +478,31 @@ class ReviewsView(APIView):
         product = Product.objects.get_or_none(slug=slug)
         return product
 
+    def get_validators(self, request, *args, **kwargs):
+        # Soft deleted reviews are included on purpose, deleting one touches its updated_at
+        row = Product.objects.filter(slug=kwargs["slug"]).values("id", "updated_at").annotate(
+            reviews=Count("review"),
+            last_review=Max("review__updated_at"),
+            last_user=Max("review__user__updated_at"),
+        ).first()
+        if row is None:
+            return None
+        params = sorted(request.query_params.lists())
+        last_modified = max(value for value in row.values() if isinstance(value, datetime))
+        return (row, params), last_modified
+
     @extend_schema(
         operation_id="reviews_product",
         summary="Product reviews",
         description="""
                 This endpoint allows the user or guest to receive all product reviews.
+                Supports conditional requests through ETag / Last-Modified.
             """,
         tags=tags,
         responses=ReviewSerializer,
         parameters=REVIEW_PARAM_EXAMPLE
     )
+    @conditional_response("get_validators")
     def get(self, request, *args, **kwargs):
         product = self.get_object(kwargs["slug"])
         if not product:
@@ -275,10 +510,11 @@ class ReviewsView(APIView):
         reviews = product.review.all()
         filter_set = ReviewFilter(request.query_params, queryset=reviews)
         if filter_set.is_valid():
-            queryset = filter_set.qs
+            fields, expand = sparse_fieldsets(request, self.read_serializer_class)
+            queryset = self.read_serializer_class.prepare(filter_set.qs, fields, expand)
             paginator = self.pagination_class()
             paginated_queryset = paginator.paginate_queryset(queryset, request)
-            serializer = ReviewSerializer(paginated_queryset, many=True)
+            serializer = self.read_serializer_class(paginated_queryset, many=True, fields=fields, expand=expand)
             return Response(data=serializer.data, status=200)
         return Response(filter_set.errors, status=400)
 
@@ -291,7 +527,9 @@ class ReviewsView(APIView):
         tags=tags,
         request=CreateReviewSerializer,
         responses=ReviewSerializer,
+        parameters=IDEMPOTENCY_KEY_PARAM_EXAMPLE,
     )
+    @idempotent()
     def post(self, request, *args, **kwargs):
         user = request.user
         product = self.get_object(kwargs["slug"])
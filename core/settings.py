@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import sys
 from datetime import timedelta
 from pathlib import Path
 from .secrets import SECRET_KEY
@@ -92,10 +93,71 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Транзакции сразу берут блокировку записи: конкурентные checkout ждут, а не падают с "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # In-memory база с shared cache не ждёт блокировок, тесты с потоками её не выдерживают
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'drf-ecommerce',
+    },
+    # Корзины (apps.shop.carts): несохранённые изменения есть только здесь, записи не должны вытесняться.
+    # В продакшене — постоянный общий бэкенд, например Redis с maxmemory-policy noeviction или volatile-lru
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'drf-ecommerce-carts',
+        'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+    },
+    # Ответы и блокировки Idempotency-Key (apps.common.idempotency): вытесненный ответ даёт повтору создать второй заказ.
+    # В продакшене — постоянный общий бэкенд без вытеснения (Redis с maxmemory-policy noeviction)
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'drf-ecommerce-idempotency',
+        'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+    },
+}
+
+RESPONSE_CACHE_TIMEOUT = 60 * 15  # Время жизни закэшированных ответов каталога, в секундах
+
+# Заголовок Idempotency-Key: сколько хранится первый ответ и сколько дубль ждёт выполняющийся запрос, в секундах.
+# Хранятся в кэше 'idempotency'. С несколькими процессами нужен общий кэш (Redis), LocMemCache виден только своему процессу
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+
+# Корзины живут в кэше и сохраняются в БД пачкой не позже чем через столько секунд после изменения
+# (и всегда перед оформлением заказа). None отключает фоновое сохранение, см. apps.shop.carts
+CART_FLUSH_INTERVAL = 30
+
+# Номер процесса (0..42874) в коде заказа tx_ref задаётся не здесь, а переменной окружения TX_REF_NODE,
+# своей в каждом процессе после fork (например, в post_fork gunicorn). Без неё: crc32(имя хоста) + pid.
+# См. apps.common.utils.CodeGenerator
+
+# Первичные ключи BaseModel: True — UUIDv7 (упорядочены по времени создания, вставки идут в конец индекса),
+# False — случайные UUIDv4. Тип колонки тот же, старые строки остаются как есть.
+# Ограничение: в уже существующей базе старые v4 id с первой hex-цифрой 1–f (около 15/16 строк) сортируются
+# выше всех новых v7 id (они начинаются с 019…), поэтому ordering = ['-id'] совпадает с порядком создания
+# только в таблицах, где все id — v7
+UUID7_PRIMARY_KEYS = False
+
+# Мягко удалённые отзывы, товары и пользователи старше стольких дней удаляются командой purge_deleted
+# (товары из оформленных заказов и пользователи с заказами остаются). True: перед удалением строки копируются в ArchivedRow
+SOFT_DELETE_RETENTION_DAYS = 90
+SOFT_DELETE_ARCHIVE = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -132,6 +194,16 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Производные изображений (миниатюры и WebP), см. apps.common.images
+# None вместо размера: WebP в исходном размере
+IMAGE_VARIANTS = {
+    'thumb': (200, 200),
+    'medium': (600, 600),
+    'full': None,
+}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_WORKERS = 4  # Потоки, обрабатывающие изображения вне запроса
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -27,4 +27,5 @@ urlpatterns = [
 
     path("shop/", include("apps.shop.urls")),
     path("sellers/", include("apps.sellers.urls")),
+    path("common/", include("apps.common.urls")),
 ]